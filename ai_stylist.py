@@ -1,6 +1,9 @@
 import os
+import time
 import google.generativeai as genai
-import json
+import style_catalog
+from circuit_breaker import get_breaker
+from json_stream import StreamingJSONParser
 
 class AIStylist:
     """AI-powered styling recommendations using Google Gemini"""
@@ -14,6 +17,9 @@ class AIStylist:
         else:
             self.model = None
             print("Warning: GEMINI_API_KEY not set. Using fallback recommendations.")
+        
+        # Skips Gemini entirely while it keeps failing (see circuit_breaker)
+        self.breaker = get_breaker('gemini')
     
     def generate_recommendations(self, skin_tone, undertone, gender='female', 
                                 vibe='casual', weather='moderate', budget='medium', 
@@ -53,89 +59,61 @@ Keep it practical, India-friendly, and culturally appropriate. Use Indian fashio
 
 Return ONLY valid JSON, no markdown formatting."""
 
-        try:
-            response = self.model.generate_content(prompt)
-            
-            # Parse JSON from response
-            text = response.text.strip()
-            if text.startswith('```json'):
-                text = text[7:]
-            if text.endswith('```'):
-                text = text[:-3]
-            
-            recommendations = json.loads(text.strip())
-            recommendations['success'] = True
-            
-            return recommendations
+        # Parse sections as chunks stream in; code fences are skipped and a
+        # cut-off reply keeps the sections that did complete
+        if not self.breaker.allow():
+            print("Gemini circuit is open; using fallback recommendations")
+            return self._generate_fallback(skin_tone, undertone, gender, vibe)
         
+        parser = StreamingJSONParser()
+        start = time.monotonic()
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True):
+                parser.feed(chunk.text)
         except Exception as e:
             print(f"AI generation error: {e}")
+        parser.close()
+        self.breaker.record(not parser.fields, time.monotonic() - start)
+        
+        if not parser.fields:
             return self._generate_fallback(skin_tone, undertone, gender, vibe)
+        
+        recommendations = dict(parser.fields)
+        if not parser.complete:
+            # Fill the sections that were lost from the built-in recommendations
+            fallback = self._generate_fallback(skin_tone, undertone, gender, vibe)
+            recommendations = {**fallback, **recommendations, 'truncated': True}
+        recommendations['success'] = True
+        recommendations['source'] = 'gemini'
+        
+        return recommendations
     
     def _generate_fallback(self, skin_tone, undertone, gender, vibe):
         """Fallback recommendations when AI is unavailable"""
         
         # Color recommendations based on skin tone and undertone
-        color_palettes = {
-            'Fair_warm': ['#E8B4A0', '#D4A574', '#8B4513', '#FF6B6B', '#FFD93D'],
-            'Fair_cool': ['#B4C7E7', '#8E7CC3', '#E91E63', '#00BCD4', '#9C27B0'],
-            'Fair_neutral': ['#FFB6C1', '#87CEEB', '#98D8C8', '#F7DC6F', '#E8DAEF'],
-            'Medium_warm': ['#D4A574', '#CD853F', '#FF8C42', '#E74C3C', '#F39C12'],
-            'Medium_cool': ['#5DADE2', '#AF7AC5', '#EC7063', '#48C9B0', '#5499C7'],
-            'Medium_neutral': ['#F8B88B', '#FAD7A0', '#A9DFBF', '#D7BDE2', '#AED6F1'],
-            'Olive_warm': ['#8B4513', '#CD853F', '#D35400', '#E67E22', '#F39C12'],
-            'Olive_cool': ['#117A65', '#1F618D', '#7D3C98', '#C0392B', '#2874A6'],
-            'Olive_neutral': ['#A04000', '#D68910', '#229954', '#5B2C6F', '#1A5490'],
-            'Deep_warm': ['#FF6B35', '#F7931E', '#FFC300', '#E74C3C', '#D35400'],
-            'Deep_cool': ['#8E44AD', '#2980B9', '#E91E63', '#16A085', '#2C3E50'],
-            'Deep_neutral': ['#E74C3C', '#F39C12', '#27AE60', '#8E44AD', '#2980B9']
-        }
-        
-        key = f"{skin_tone}_{undertone}"
-        colors = color_palettes.get(key, color_palettes['Medium_neutral'])
+        catalog = style_catalog.current()
+        fallback = catalog.stylist_fallback
+        colors = catalog.stylist_colors(skin_tone, undertone)
         
         return {
             'success': True,
+            'source': 'fallback',
             'color_palette': [
-                {'name': 'Primary', 'hex': colors[0]},
-                {'name': 'Secondary', 'hex': colors[1]},
-                {'name': 'Accent', 'hex': colors[2]},
-                {'name': 'Neutral', 'hex': colors[3]},
-                {'name': 'Pop', 'hex': colors[4]}
+                {'name': name, 'hex': color}
+                for name, color in zip(fallback['color_names'], colors)
             ],
             'outfits': [
                 {
-                    'name': f'{vibe.capitalize()} Look 1',
-                    'items': ['Kurta', 'Palazzo', 'Dupatta'],
-                    'colors': [colors[0], colors[1], colors[3]]
-                },
-                {
-                    'name': f'{vibe.capitalize()} Look 2',
-                    'items': ['Top', 'Jeans', 'Jacket'],
-                    'colors': [colors[2], colors[4], colors[1]]
-                },
-                {
-                    'name': f'{vibe.capitalize()} Look 3',
-                    'items': ['Dress', 'Belt', 'Shoes'],
-                    'colors': [colors[0], colors[2], colors[3]]
+                    'name': f'{vibe.capitalize()} Look {number}',
+                    'items': list(outfit['items']),
+                    'colors': [colors[i] for i in outfit['colors']]
                 }
+                for number, outfit in enumerate(fallback['outfits'], 1)
             ],
-            'accessories': [
-                'Statement earrings',
-                'Layered necklace',
-                'Woven handbag',
-                'Sunglasses',
-                'Ankle boots'
-            ],
-            'hairstyle': [
-                'Soft waves with side part',
-                'Sleek low bun with face-framing layers'
-            ],
-            'shopping_tips': [
-                'Look for natural fabrics like cotton and linen for Indian weather',
-                'Mix traditional and western pieces for versatile styling',
-                'Invest in neutral basics and add color with accessories'
-            ],
+            'accessories': list(fallback['accessories']),
+            'hairstyle': list(fallback['hairstyle']),
+            'shopping_tips': list(fallback['shopping_tips']),
             'explanation': f'These recommendations complement your {skin_tone.lower()} skin tone with {undertone} undertones. The color palette enhances your natural beauty while the outfit suggestions match your {vibe} style preference.'
         }
     
@@ -0,0 +1,128 @@
+"""Parallel skin analysis of many images with a process pool"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Per-process analyzer, created once by the pool initializer
+_worker_analyzer = None
+
+
+def _init_worker(pixel_budget):
+    """Load the Haar cascade once per worker process"""
+    global _worker_analyzer
+    import cv2
+    from skin_analyzer import SkinAnalyzer
+
+    # Parallelism comes from the pool; avoid oversubscribing cores
+    cv2.setNumThreads(1)
+    _worker_analyzer = SkinAnalyzer(pixel_budget=pixel_budget)
+
+
+def _analyze_chunk(images):
+    """Analyze a chunk of images in a worker; a failing image does not sink the rest"""
+    results = []
+    for image in images:
+        try:
+            results.append(_worker_analyzer.analyze(image))
+        except Exception as e:
+            results.append({'error': str(e)})
+    return results
+
+
+class BatchAnalyzer:
+    """Runs SkinAnalyzer over batches of images on a pool of worker processes"""
+
+    def __init__(self, max_workers=None, pixel_budget=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pixel_budget = pixel_budget
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(self.pixel_budget,)
+        )
+
+    def analyze_batch(self, images, chunksize=None):
+        """
+        Analyze paths, bytes or file-like objects in parallel.
+        Every chunk is submitted before this returns, so pool errors are
+        raised here rather than while the results are consumed. Returns an
+        iterator with one result per image, in input order, each as soon as
+        it is ready; images lost to a crashed worker get an 'error' result.
+        """
+        images = [self._picklable(image) for image in images]
+        if not images:
+            return iter(())
+
+        if chunksize is None:
+            chunksize = self._default_chunksize(len(images))
+        chunks = [images[i:i + chunksize] for i in range(0, len(images), chunksize)]
+
+        executor = self._executor
+        try:
+            futures = [executor.submit(_analyze_chunk, chunk) for chunk in chunks]
+        except BrokenProcessPool:
+            # A worker died in an earlier batch; start a fresh pool and retry once
+            executor = self._restart(executor)
+            futures = [executor.submit(_analyze_chunk, chunk) for chunk in chunks]
+        return self._results(executor, futures, chunks)
+
+    def _results(self, executor, futures, chunks):
+        for future, chunk in zip(futures, chunks):
+            try:
+                results = future.result()
+            except BrokenProcessPool as e:
+                self._restart(executor)
+                results = [{'error': f'Worker process failed: {e}'}] * len(chunk)
+            except Exception as e:
+                results = [{'error': str(e)}] * len(chunk)
+            yield from results
+
+    def _restart(self, broken):
+        """Replace a broken pool (once, however many callers notice) and return the new one"""
+        with self._lock:
+            if self._executor is broken:
+                print("Batch worker pool broke; starting a new one")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+            return self._executor
+
+    def _default_chunksize(self, count):
+        """About four chunks per worker so slow images do not stall the tail"""
+        return max(1, min(64, count // (self.max_workers * 4)))
+
+    @staticmethod
+    def _picklable(image):
+        """File objects cannot cross process boundaries, so send their bytes"""
+        if isinstance(image, (str, os.PathLike, bytes)):
+            return image
+        if isinstance(image, (bytearray, memoryview)):
+            return bytes(image)
+        return image.read()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def analyze_batch(images, max_workers=None, pixel_budget=None, chunksize=None):
+    """One-off batch analysis; returns the results as a list in input order"""
+    with BatchAnalyzer(max_workers, pixel_budget) as analyzer:
+        return list(analyzer.analyze_batch(images, chunksize))
+
+
+if __name__ == '__main__':
+    import json
+    import sys
+
+    for path, result in zip(sys.argv[1:], analyze_batch(sys.argv[1:])):
+        print(json.dumps({'path': path, **result}))
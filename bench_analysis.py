@@ -0,0 +1,149 @@
+"""
+Benchmark the /analyze pixel averaging: legacy per-pixel Python vs NumPy,
+and full-resolution vs reduced-resolution decoding. Fails if reduced
+decoding drifts more than MAX_DRIFT per channel or changes the class.
+"""
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from color_analysis import DEFAULT_PIXEL_BUDGET, analyze_image, center_box
+
+SIZES = [
+    (640, 480),
+    (1280, 960),
+    (1920, 1440),
+    (3024, 4032),  # 12 MP phone photo
+]
+
+# Largest per-channel difference allowed between full and reduced decoding
+MAX_DRIFT = 2
+
+
+def legacy_analyze(img):
+    """The original getdata()-based averaging from server_simple.analyze_skin"""
+    img = img.convert('RGB')
+    width, height = img.size
+    center_region = img.crop(center_box(width, height))
+
+    pixels = list(center_region.getdata())
+    avg_r = sum(p[0] for p in pixels) // len(pixels)
+    avg_g = sum(p[1] for p in pixels) // len(pixels)
+    avg_b = sum(p[2] for p in pixels) // len(pixels)
+    return [avg_r, avg_g, avg_b]
+
+
+def make_image(width, height, seed=0):
+    """Random skin-ish test image"""
+    rng = np.random.default_rng(seed)
+    base = np.array([198, 150, 120], dtype=np.int16)
+    noise = rng.integers(-40, 40, size=(height, width, 3), dtype=np.int16)
+    return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), 'RGB')
+
+
+def best_of(fn, repeat):
+    """Best wall-clock time of several runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def make_jpeg(width, height, seed=0):
+    """Encoded JPEG bytes with a smooth gradient, like a lit face"""
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width]
+    shade = (40 * xs / width - 20 * ys / height).astype(np.int16)[..., None]
+    base = np.array([190, 145, 115], dtype=np.int16)
+    noise = rng.integers(-15, 15, size=(height, width, 3), dtype=np.int16)
+    pixels = np.clip(base + shade + noise, 0, 255).astype(np.uint8)
+
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, 'RGB').save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def make_encoded(width, height, fmt, mode, seed=0):
+    """Encoded non-JPEG test image in the given PIL mode"""
+    img = Image.open(io.BytesIO(make_jpeg(width, height, seed))).convert('RGB')
+    if mode == 'P':
+        img = img.convert('P', palette=Image.ADAPTIVE)
+    elif mode == 'I;16':
+        # 16-bit greyscale, values scaled into 0..255 like an 8-bit image
+        img = Image.fromarray(np.asarray(img.convert('L')).astype(np.uint16), 'I;16')
+    else:
+        img = img.convert(mode)
+    buffer = io.BytesIO()
+    img.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def check_drift(label, full, reduced):
+    """Per-channel drift of the reduced result; raises if it is out of bounds"""
+    drift = max(abs(a - b) for a, b in zip(full['rgb'], reduced['rgb']))
+    same = (full['skin_tone'], full['undertone']) == (reduced['skin_tone'], reduced['undertone'])
+    assert drift <= MAX_DRIFT, f"{label}: reduced decode drifted {drift} > {MAX_DRIFT}"
+    assert same, f"{label}: reduced decode changed the class"
+    return drift
+
+
+def decode_and_analyze(data, pixel_budget):
+    """Full /analyze path from encoded bytes"""
+    with Image.open(io.BytesIO(data)) as img:
+        return analyze_image(img, pixel_budget)
+
+
+def bench_averaging():
+    print(f"{'size':>12} {'legacy (ms)':>12} {'numpy (ms)':>12} {'speedup':>9}  match")
+    for width, height in SIZES:
+        img = make_image(width, height)
+        repeat = 3 if width * height < 4_000_000 else 1
+
+        legacy_time, legacy_rgb = best_of(lambda: legacy_analyze(img), repeat)
+        numpy_time, result = best_of(lambda: analyze_image(img), repeat * 5)
+
+        match = 'yes' if legacy_rgb == result['rgb'] else f'NO {legacy_rgb} != {result["rgb"]}'
+        print(f"{width}x{height:<7} {legacy_time * 1000:12.1f} {numpy_time * 1000:12.1f} "
+              f"{legacy_time / numpy_time:8.1f}x  {match}")
+
+
+def bench_reduced_decode(pixel_budget=DEFAULT_PIXEL_BUDGET):
+    print(f"\nReduced decode (pixel budget {pixel_budget:,})")
+    print(f"{'size':>12} {'full (ms)':>12} {'reduced (ms)':>13} {'speedup':>9} "
+          f"{'max drift':>10}  same class")
+    for width, height in SIZES:
+        data = make_jpeg(width, height)
+
+        full_time, full = best_of(lambda: decode_and_analyze(data, None), 3)
+        reduced_time, reduced = best_of(lambda: decode_and_analyze(data, pixel_budget), 3)
+
+        drift = check_drift(f"{width}x{height} JPEG", full, reduced)
+        print(f"{width}x{height:<7} {full_time * 1000:12.1f} {reduced_time * 1000:13.1f} "
+              f"{full_time / reduced_time:8.1f}x {drift:10d}  yes")
+
+
+def bench_reduced_formats(pixel_budget=DEFAULT_PIXEL_BUDGET, size=(2000, 2000)):
+    print(f"\nReduced decode, other formats ({size[0]}x{size[1]})")
+    print(f"{'format':>12} {'full (ms)':>12} {'reduced (ms)':>13} {'max drift':>10}")
+    for fmt, mode in [('PNG', 'RGB'), ('PNG', 'RGBA'), ('PNG', 'P'), ('GIF', 'P'), ('PNG', 'I;16')]:
+        data = make_encoded(*size, fmt, mode)
+
+        full_time, full = best_of(lambda: decode_and_analyze(data, None), 3)
+        reduced_time, reduced = best_of(lambda: decode_and_analyze(data, pixel_budget), 3)
+
+        drift = check_drift(f"{fmt} {mode}", full, reduced)
+        print(f"{fmt + ' ' + mode:>12} {full_time * 1000:12.1f} {reduced_time * 1000:13.1f} {drift:10d}")
+
+
+def main():
+    bench_averaging()
+    bench_reduced_decode()
+    bench_reduced_formats()
+
+
+if __name__ == '__main__':
+    main()
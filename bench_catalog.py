@@ -0,0 +1,313 @@
+"""
+Benchmark the built-in recommendation lookup: rebuilding the tables on every
+request (the old /recommend fallback) vs the precompiled style_catalog, and
+the cost of a catalog (re)load.
+"""
+import json
+import time
+
+import style_catalog
+
+PROFILES = [
+    ('Fair', 'cool', 'party'),
+    ('Medium', 'warm', 'wedding'),
+    ('Olive', 'neutral', 'work'),
+    ('Deep', 'warm', 'festival'),
+    ('Medium', 'neutral', 'daily'),  # occasion missing from the tables
+]
+
+
+LEGACY_DEFAULT_PALETTE_KEY = 'Medium_neutral'
+
+LEGACY_DEFAULT_ACCESSORIES = ['Statement Earrings', 'Crossbody Bag', 'Sunglasses', 'Watch', 'Scarf']
+
+LEGACY_DEFAULT_HAIRSTYLES = ['Soft Waves', 'Low Bun']
+
+LEGACY_DEFAULT_OUTFITS = [
+    {'name': 'Casual Look', 'items': ['Floral Top', 'Denim Jeans', 'White Sneakers'], 'colors': ['#FF6B6B', '#4D96FF', '#FFFFFF']},
+    {'name': 'Everyday Chic', 'items': ['T-shirt', 'Palazzo', 'Flats'], 'colors': ['#FFD93D', '#2C3E50', '#8B4513']},
+]
+
+
+def legacy_tables():
+    """The tables as the old /recommend handler built them, as literals, on every call"""
+    # Personalized color palettes based on skin tone and undertone
+    color_palettes = {
+        'Fair_warm': [
+            {'name': 'Peach', 'hex': '#FFDAB9'},
+            {'name': 'Coral', 'hex': '#FF7F50'},
+            {'name': 'Warm Brown', 'hex': '#8B4513'},
+            {'name': 'Golden Yellow', 'hex': '#FFD700'},
+            {'name': 'Rust Orange', 'hex': '#B7410E'}
+        ],
+        'Fair_cool': [
+            {'name': 'Baby Pink', 'hex': '#F4C2C2'},
+            {'name': 'Lavender', 'hex': '#E6E6FA'},
+            {'name': 'Navy Blue', 'hex': '#000080'},
+            {'name': 'Emerald Green', 'hex': '#50C878'},
+            {'name': 'Royal Purple', 'hex': '#7851A9'}
+        ],
+        'Fair_neutral': [
+            {'name': 'Soft Pink', 'hex': '#FFB6C1'},
+            {'name': 'Sky Blue', 'hex': '#87CEEB'},
+            {'name': 'Mint Green', 'hex': '#98FF98'},
+            {'name': 'Lemon Yellow', 'hex': '#FFF44F'},
+            {'name': 'Lilac', 'hex': '#C8A2C8'}
+        ],
+        'Medium_warm': [
+            {'name': 'Terracotta', 'hex': '#E2725B'},
+            {'name': 'Olive Green', 'hex': '#808000'},
+            {'name': 'Burnt Orange', 'hex': '#CC5500'},
+            {'name': 'Mustard Yellow', 'hex': '#FFDB58'},
+            {'name': 'Warm Red', 'hex': '#DC143C'}
+        ],
+        'Medium_cool': [
+            {'name': 'Teal', 'hex': '#008080'},
+            {'name': 'Magenta', 'hex': '#FF00FF'},
+            {'name': 'Cool Pink', 'hex': '#FF69B4'},
+            {'name': 'Turquoise', 'hex': '#40E0D0'},
+            {'name': 'Plum', 'hex': '#8E4585'}
+        ],
+        'Medium_neutral': [
+            {'name': 'Rose Gold', 'hex': '#B76E79'},
+            {'name': 'Sage Green', 'hex': '#9DC183'},
+            {'name': 'Dusty Rose', 'hex': '#DCAE96'},
+            {'name': 'Soft Coral', 'hex': '#F88379'},
+            {'name': 'Periwinkle', 'hex': '#CCCCFF'}
+        ],
+        'Olive_warm': [
+            {'name': 'Army Green', 'hex': '#4B5320'},
+            {'name': 'Bronze', 'hex': '#CD7F32'},
+            {'name': 'Camel', 'hex': '#C19A6B'},
+            {'name': 'Burnt Sienna', 'hex': '#E97451'},
+            {'name': 'Warm Beige', 'hex': '#D2B48C'}
+        ],
+        'Olive_cool': [
+            {'name': 'Forest Green', 'hex': '#228B22'},
+            {'name': 'Deep Purple', 'hex': '#673AB7'},
+            {'name': 'Burgundy', 'hex': '#800020'},
+            {'name': 'Slate Blue', 'hex': '#6A5ACD'},
+            {'name': 'Charcoal', 'hex': '#36454F'}
+        ],
+        'Olive_neutral': [
+            {'name': 'Khaki', 'hex': '#C3B091'},
+            {'name': 'Moss Green', 'hex': '#8A9A5B'},
+            {'name': 'Taupe', 'hex': '#483C32'},
+            {'name': 'Mauve', 'hex': '#E0B0FF'},
+            {'name': 'Steel Blue', 'hex': '#4682B4'}
+        ],
+        'Deep_warm': [
+            {'name': 'Rich Gold', 'hex': '#FFD700'},
+            {'name': 'Bright Orange', 'hex': '#FF8C00'},
+            {'name': 'Crimson', 'hex': '#DC143C'},
+            {'name': 'Amber', 'hex': '#FFBF00'},
+            {'name': 'Copper', 'hex': '#B87333'}
+        ],
+        'Deep_cool': [
+            {'name': 'Electric Blue', 'hex': '#7DF9FF'},
+            {'name': 'Hot Pink', 'hex': '#FF69B4'},
+            {'name': 'Violet', 'hex': '#8F00FF'},
+            {'name': 'Cyan', 'hex': '#00FFFF'},
+            {'name': 'Fuchsia', 'hex': '#FF00FF'}
+        ],
+        'Deep_neutral': [
+            {'name': 'Ruby Red', 'hex': '#E0115F'},
+            {'name': 'Sapphire Blue', 'hex': '#0F52BA'},
+            {'name': 'Emerald', 'hex': '#50C878'},
+            {'name': 'Amethyst', 'hex': '#9966CC'},
+            {'name': 'Topaz', 'hex': '#FFC87C'}
+        ]
+    }
+    
+    # Personalized accessories based on occasion and undertone
+    accessories_by_occasion = {
+        'wedding': {
+            'warm': ['Gold Jhumkas', 'Kundan Necklace', 'Gold Bangles', 'Maang Tikka', 'Embroidered Clutch'],
+            'cool': ['Silver Chandbalis', 'Diamond Necklace', 'Silver Bangles', 'Pearl Maang Tikka', 'Sequin Clutch'],
+            'neutral': ['Rose Gold Earrings', 'Polki Necklace', 'Mixed Metal Bangles', 'Crystal Maang Tikka', 'Beaded Clutch']
+        },
+        'party': {
+            'warm': ['Gold Hoops', 'Layered Gold Chain', 'Metallic Clutch', 'Gold Watch', 'Amber Ring'],
+            'cool': ['Silver Studs', 'Platinum Chain', 'Sequin Bag', 'Silver Watch', 'Sapphire Ring'],
+            'neutral': ['Rose Gold Danglers', 'Delicate Necklace', 'Satin Clutch', 'Minimalist Watch', 'Pearl Ring']
+        },
+        'work': {
+            'warm': ['Small Gold Studs', 'Thin Gold Chain', 'Leather Tote', 'Classic Watch', 'Simple Ring'],
+            'cool': ['Silver Studs', 'Silver Pendant', 'Black Tote', 'Steel Watch', 'Minimal Ring'],
+            'neutral': ['Pearl Studs', 'Delicate Chain', 'Beige Tote', 'Leather Watch', 'Stackable Rings']
+        },
+        'gym': {
+            'warm': ['Sports Watch', 'Gym Bag', 'Sweatband', 'Fitness Tracker', 'Water Bottle'],
+            'cool': ['Fitness Watch', 'Duffle Bag', 'Headband', 'Activity Tracker', 'Insulated Bottle'],
+            'neutral': ['Smart Watch', 'Backpack', 'Hair Ties', 'Step Counter', 'Shaker Bottle']
+        },
+        'beach': {
+            'warm': ['Gold Anklet', 'Straw Hat', 'Woven Beach Bag', 'Tortoise Sunglasses', 'Shell Bracelet'],
+            'cool': ['Silver Anklet', 'White Sun Hat', 'Canvas Tote', 'Blue Sunglasses', 'Turquoise Bracelet'],
+            'neutral': ['Beaded Anklet', 'Floppy Hat', 'Mesh Beach Bag', 'Mirrored Sunglasses', 'Leather Bracelet']
+        },
+        'date': {
+            'warm': ['Dainty Gold Necklace', 'Small Hoops', 'Crossbody Bag', 'Delicate Bracelet', 'Nude Heels'],
+            'cool': ['Silver Pendant', 'Pearl Studs', 'Mini Bag', 'Silver Bracelet', 'Strappy Heels'],
+            'neutral': ['Layered Necklace', 'Drop Earrings', 'Clutch Bag', 'Charm Bracelet', 'Block Heels']
+        },
+        'festival': {
+            'warm': ['Oxidized Jhumkas', 'Coin Necklace', 'Potli Bag', 'Colorful Bangles', 'Embroidered Juttis'],
+            'cool': ['Silver Chandbalis', 'Temple Jewelry', 'Mirror Work Bag', 'Silver Bangles', 'Mojaris'],
+            'neutral': ['Tribal Earrings', 'Beaded Necklace', 'Ethnic Clutch', 'Thread Bangles', 'Kolhapuri Chappals']
+        }
+    }
+    
+    # Personalized hairstyles based on occasion and face shape (inferred from skin tone)
+    hairstyles_by_occasion = {
+        'wedding': {
+            'Fair': ['Elegant Low Bun with Flowers', 'Side-swept Curls with Maang Tikka'],
+            'Medium': ['Braided Crown with Gajra', 'Soft Waves with Hair Accessories'],
+            'Olive': ['Sleek High Bun with Jewelry', 'Half-up Half-down with Curls'],
+            'Deep': ['Voluminous Curls with Side Part', 'Twisted Updo with Statement Pins']
+        },
+        'party': {
+            'Fair': ['Beachy Waves', 'High Ponytail with Volume'],
+            'Medium': ['Sleek Straight Hair', 'Messy Bun with Face-framing Layers'],
+            'Olive': ['Bouncy Curls', 'Side-swept Waves'],
+            'Deep': ['Defined Curls', 'Slicked Back Bun']
+        },
+        'work': {
+            'Fair': ['Low Ponytail', 'Simple Straight Blowout'],
+            'Medium': ['Professional Low Bun', 'Neat Middle Part'],
+            'Olive': ['Sleek Ponytail', 'Tucked Behind Ears'],
+            'Deep': ['Polished Bun', 'Natural Texture with Headband']
+        },
+        'gym': {
+            'Fair': ['High Ponytail', 'Dutch Braids'],
+            'Medium': ['Top Knot', 'Braided Ponytail'],
+            'Olive': ['Sleek Bun', 'Double French Braids'],
+            'Deep': ['Puff with Ponytail', 'Cornrows']
+        },
+        'beach': {
+            'Fair': ['Loose Beach Waves', 'Messy Braid'],
+            'Medium': ['Natural Texture', 'Low Pigtails'],
+            'Olive': ['Wet Look Slick Back', 'Fishtail Braid'],
+            'Deep': ['Protective Style with Scarf', 'Box Braids']
+        },
+        'date': {
+            'Fair': ['Soft Romantic Curls', 'Half-up with Loose Waves'],
+            'Medium': ['Voluminous Blowout', 'Low Side Braid'],
+            'Olive': ['Sleek and Straight', 'Textured Ponytail'],
+            'Deep': ['Defined Curls with Side Part', 'Elegant Low Ponytail']
+        }
+    }
+    
+    # Personalized outfits based on skin tone and undertone
+    outfit_recommendations = {
+        'Fair_warm': [
+            {'name': 'Peachy Elegance', 'items': ['Peach Blouse', 'Beige Trousers', 'Gold Accessories'], 'colors': ['#FFDAB9', '#F5DEB3', '#FFD700']},
+            {'name': 'Coral Chic', 'items': ['Coral Dress', 'Nude Heels', 'Gold Jewelry'], 'colors': ['#FF7F50', '#F5DEB3', '#FFD700']},
+        ],
+        'Fair_cool': [
+            {'name': 'Lavender Dream', 'items': ['Lavender Top', 'White Pants', 'Silver Jewelry'], 'colors': ['#E6E6FA', '#FFFFFF', '#C0C0C0']},
+            {'name': 'Navy Sophistication', 'items': ['Navy Blazer', 'Pink Shirt', 'Silver Accessories'], 'colors': ['#000080', '#FFB6C1', '#C0C0C0']},
+        ],
+        'Fair_neutral': [
+            {'name': 'Soft Pink Charm', 'items': ['Pink Dress', 'Beige Cardigan', 'Rose Gold Jewelry'], 'colors': ['#FFB6C1', '#F5DEB3', '#B76E79']},
+            {'name': 'Sky Blue Fresh', 'items': ['Sky Blue Top', 'White Skirt', 'Silver Accessories'], 'colors': ['#87CEEB', '#FFFFFF', '#C0C0C0']},
+        ],
+        'Medium_warm': [
+            {'name': 'Terracotta Sunset', 'items': ['Terracotta Dress', 'Brown Belt', 'Gold Jewelry'], 'colors': ['#E2725B', '#8B4513', '#FFD700']},
+            {'name': 'Olive Elegance', 'items': ['Olive Green Top', 'Mustard Pants', 'Bronze Accessories'], 'colors': ['#808000', '#FFDB58', '#CD7F32']},
+        ],
+        'Medium_cool': [
+            {'name': 'Teal Sophistication', 'items': ['Teal Dress', 'Silver Heels', 'Cool Pink Scarf'], 'colors': ['#008080', '#C0C0C0', '#FF69B4']},
+            {'name': 'Magenta Magic', 'items': ['Magenta Top', 'Black Pants', 'Silver Jewelry'], 'colors': ['#FF00FF', '#000000', '#C0C0C0']},
+        ],
+        'Medium_neutral': [
+            {'name': 'Rose Gold Glow', 'items': ['Rose Gold Dress', 'Nude Heels', 'Delicate Jewelry'], 'colors': ['#B76E79', '#F5DEB3', '#FFD700']},
+            {'name': 'Sage Serenity', 'items': ['Sage Green Top', 'Beige Pants', 'Gold Accessories'], 'colors': ['#9DC183', '#F5DEB3', '#FFD700']},
+        ],
+        'Olive_warm': [
+            {'name': 'Army Chic', 'items': ['Army Green Jacket', 'Camel Pants', 'Bronze Jewelry'], 'colors': ['#4B5320', '#C19A6B', '#CD7F32']},
+            {'name': 'Bronze Beauty', 'items': ['Bronze Dress', 'Brown Accessories', 'Gold Jewelry'], 'colors': ['#CD7F32', '#8B4513', '#FFD700']},
+        ],
+        'Olive_cool': [
+            {'name': 'Forest Mystique', 'items': ['Forest Green Dress', 'Black Heels', 'Silver Jewelry'], 'colors': ['#228B22', '#000000', '#C0C0C0']},
+            {'name': 'Burgundy Elegance', 'items': ['Burgundy Top', 'Black Pants', 'Gold Accessories'], 'colors': ['#800020', '#000000', '#FFD700']},
+        ],
+        'Olive_neutral': [
+            {'name': 'Khaki Comfort', 'items': ['Khaki Dress', 'Brown Belt', 'Gold Jewelry'], 'colors': ['#C3B091', '#8B4513', '#FFD700']},
+            {'name': 'Moss Green Fresh', 'items': ['Moss Green Top', 'Beige Pants', 'Bronze Accessories'], 'colors': ['#8A9A5B', '#F5DEB3', '#CD7F32']},
+        ],
+        'Deep_warm': [
+            {'name': 'Golden Goddess', 'items': ['Gold Dress', 'Copper Accessories', 'Amber Jewelry'], 'colors': ['#FFD700', '#B87333', '#FFBF00']},
+            {'name': 'Crimson Queen', 'items': ['Crimson Dress', 'Gold Heels', 'Bright Accessories'], 'colors': ['#DC143C', '#FFD700', '#FF8C00']},
+        ],
+        'Deep_cool': [
+            {'name': 'Electric Diva', 'items': ['Electric Blue Dress', 'Silver Heels', 'Bold Jewelry'], 'colors': ['#7DF9FF', '#C0C0C0', '#FF69B4']},
+            {'name': 'Violet Royalty', 'items': ['Violet Gown', 'Silver Accessories', 'Statement Jewelry'], 'colors': ['#8F00FF', '#C0C0C0', '#FF00FF']},
+        ],
+        'Deep_neutral': [
+            {'name': 'Ruby Radiance', 'items': ['Ruby Red Dress', 'Gold Jewelry', 'Black Heels'], 'colors': ['#E0115F', '#FFD700', '#000000']},
+            {'name': 'Emerald Elegance', 'items': ['Emerald Dress', 'Gold Accessories', 'Nude Heels'], 'colors': ['#50C878', '#FFD700', '#F5DEB3']},
+        ]
+    }
+    
+    return {
+        'color_palettes': color_palettes,
+        'accessories_by_occasion': accessories_by_occasion,
+        'hairstyles_by_occasion': hairstyles_by_occasion,
+        'outfit_recommendations': outfit_recommendations
+    }
+
+
+def legacy_lookup(skin_tone, undertone, occasion):
+    """The original per-call table build and selection from builtin_recommendations"""
+    tables = legacy_tables()
+    palettes = tables['color_palettes']
+    palette_key = f"{skin_tone}_{undertone}"
+    return {
+        'color_palette': palettes.get(palette_key, palettes[LEGACY_DEFAULT_PALETTE_KEY]),
+        'outfits': tables['outfit_recommendations'].get(palette_key, LEGACY_DEFAULT_OUTFITS),
+        'accessories': tables['accessories_by_occasion'].get(occasion, {}).get(
+            undertone, LEGACY_DEFAULT_ACCESSORIES),
+        'hairstyle': tables['hairstyles_by_occasion'].get(occasion, {}).get(
+            skin_tone, LEGACY_DEFAULT_HAIRSTYLES)
+    }
+
+
+def best_of(fn, repeat):
+    """Best wall-clock time of several runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def normalized(entry):
+    return json.loads(json.dumps(entry, default=style_catalog.json_default))
+
+
+def bench_lookup(calls=10_000):
+    print(f"{'profile':>26} {'legacy (us)':>12} {'catalog (us)':>13} {'speedup':>9}  match")
+    for profile in PROFILES:
+        legacy_time, legacy = best_of(lambda: [legacy_lookup(*profile) for _ in range(calls)][-1], 3)
+        catalog_time, entry = best_of(lambda: [style_catalog.lookup(*profile) for _ in range(calls)][-1], 3)
+
+        match = 'yes' if normalized(legacy) == normalized(entry) else 'NO'
+        print(f"{'/'.join(profile):>26} {legacy_time / calls * 1e6:12.2f} {catalog_time / calls * 1e6:13.2f} "
+              f"{legacy_time / catalog_time:8.1f}x  {match}")
+
+
+def bench_load():
+    load_time, catalog = best_of(style_catalog.Catalog.load, 5)
+    print(f"\nCatalog {catalog.version}: {len(catalog.entries)} precompiled entries, "
+          f"load + compile {load_time * 1000:.1f} ms")
+
+
+def main():
+    bench_lookup()
+    bench_load()
+
+
+if __name__ == '__main__':
+    main()
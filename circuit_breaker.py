@@ -0,0 +1,187 @@
+"""Circuit breakers that skip calls to an AI provider while it is failing or slow"""
+import os
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# One breaker per provider name, shared by every client in the process
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome and latency of calls over a rolling time window.
+    The circuit opens when, over at least `min_calls` calls, the error rate
+    or the share of calls slower than `slow_call_seconds` reaches its
+    threshold. While open every call is refused at once; after
+    `open_seconds` up to `half_open_probes` trial calls are let through,
+    closing the circuit if they all succeed and reopening it otherwise.
+    """
+
+    def __init__(self, name, window_seconds=60, min_calls=5, error_threshold=0.5,
+                 slow_call_seconds=10, slow_threshold=0.8, open_seconds=30, half_open_probes=1):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_threshold = slow_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._lock = threading.Lock()
+        self._calls = deque()  # (finished_at, failed, latency)
+        self._state = CLOSED
+        self._opened_at = None
+        self._probes = 0
+        self._probe_successes = 0
+        self._counters = {'calls': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    def allow(self):
+        """
+        Whether a call may go ahead now. Every allowed call must be followed
+        by record(), which also releases a half-open probe slot.
+        """
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self._counters['rejected'] += 1
+                    return False
+                self._state = HALF_OPEN
+                self._probes = 0
+                self._probe_successes = 0
+
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self._counters['rejected'] += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def record(self, failed, latency):
+        """Report the outcome of an allowed call"""
+        now = time.monotonic()
+        with self._lock:
+            self._counters['calls'] += 1
+            self._counters['failures'] += bool(failed)
+
+            if self._state == HALF_OPEN:
+                # A slow probe means the provider has not recovered either
+                if failed or latency >= self.slow_call_seconds:
+                    self._open(now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._state = CLOSED
+                        self._calls.clear()
+                return
+
+            self._calls.append((now, bool(failed), latency))
+            self._expire(now)
+            if self._state == CLOSED and len(self._calls) >= self.min_calls:
+                error_rate, slow_rate = self._rates()
+                if error_rate >= self.error_threshold or slow_rate >= self.slow_threshold:
+                    self._open(now)
+
+    def release(self):
+        """Give back the probe slot of an allowed call abandoned without an outcome"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def call(self, fn, *args, failed=None, **kwargs):
+        """
+        Run fn through the breaker. Raises CircuitOpenError if the circuit
+        is open; exceptions and results for which failed(result) is true
+        count as failures.
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        start = time.monotonic()
+        is_failure = True
+        try:
+            result = fn(*args, **kwargs)
+            is_failure = bool(failed and failed(result))
+            return result
+        finally:
+            self.record(is_failure, time.monotonic() - start)
+
+    def _open(self, now):
+        self._state = OPEN
+        self._opened_at = now
+        self._counters['opened'] += 1
+        print(f"Circuit for {self.name} opened")
+
+    def _expire(self, now):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _rates(self):
+        count = len(self._calls)
+        if not count:
+            return 0.0, 0.0
+        errors = sum(1 for _, failed, _ in self._calls if failed)
+        slow = sum(1 for _, _, latency in self._calls if latency >= self.slow_call_seconds)
+        return errors / count, slow / count
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def status(self):
+        """State, rolling error/slow rates and latency, and lifetime counters"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            error_rate, slow_rate = self._rates()
+            latencies = sorted(latency for _, _, latency in self._calls)
+            status = {
+                'name': self.name,
+                'state': self._state,
+                'window_calls': len(latencies),
+                'error_rate': round(error_rate, 3),
+                'slow_rate': round(slow_rate, 3),
+                'avg_latency': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                'p95_latency': round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else 0.0,
+                **self._counters
+            }
+            if self._state == OPEN:
+                status['retry_in'] = round(max(0.0, self.open_seconds - (now - self._opened_at)), 1)
+        return status
+
+
+def get_breaker(name):
+    """
+    The process-wide breaker for a provider, configured from
+    CIRCUIT_* environment variables on first use
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                window_seconds=float(os.getenv('CIRCUIT_WINDOW', 60)),
+                min_calls=int(os.getenv('CIRCUIT_MIN_CALLS', 5)),
+                error_threshold=float(os.getenv('CIRCUIT_ERROR_THRESHOLD', 0.5)),
+                slow_call_seconds=float(os.getenv('CIRCUIT_SLOW_CALL', 10)),
+                slow_threshold=float(os.getenv('CIRCUIT_SLOW_THRESHOLD', 0.8)),
+                open_seconds=float(os.getenv('CIRCUIT_OPEN_SECONDS', 30))
+            )
+        return _breakers[name]
+
+
+def all_status():
+    """status() of every breaker created in this process"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.status() for breaker in breakers}
@@ -0,0 +1,120 @@
+"""NumPy-backed colour analysis for skin tone detection"""
+import numpy as np
+from color_classifier import classify
+
+# Decode at no less than this many pixels when reducing large uploads
+DEFAULT_PIXEL_BUDGET = 160_000
+
+# Scales JPEG can decode at natively (DCT scaling)
+DECODE_SCALES = (8, 4, 2)
+
+
+def center_box(width, height):
+    """Central crop box (face area) used by the simple analyzer"""
+    return (width // 4, height // 4, 3 * width // 4, 3 * height // 4)
+
+
+def reduced_decode_scale(width, height, pixel_budget):
+    """
+    Pick the coarsest 1/2, 1/4 or 1/8 decode scale that still leaves at
+    least `pixel_budget` pixels. A falsy budget means full resolution.
+    """
+    if not pixel_budget:
+        return 1
+
+    for scale in DECODE_SCALES:
+        if (width // scale) * (height // scale) >= pixel_budget:
+            return scale
+    return 1
+
+
+def open_reduced(img, pixel_budget=DEFAULT_PIXEL_BUDGET):
+    """
+    Reduce a freshly opened (not yet loaded) PIL image to the pixel budget.
+    JPEGs are decoded at reduced scale via draft(); other formats are
+    decoded and then box-reduced. reduce() only handles plain pixel modes,
+    so palette, 16-bit and alpha images are converted to RGB first (the
+    same conversion analyze_image applies at full resolution).
+    """
+    scale = reduced_decode_scale(img.width, img.height, pixel_budget)
+    if scale == 1:
+        return img
+
+    if img.format == 'JPEG':
+        img.draft('RGB', (img.width // scale, img.height // scale))
+        return img
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    return img.reduce(scale)
+
+
+def average_rgb(pixels):
+    """
+    Integer average colour of an (H, W, 3) RGB array.
+    Works on the image buffer directly (views are fine) and matches the
+    floor division of summing every pixel in Python.
+    """
+    pixels = np.asarray(pixels)
+    count = pixels.shape[0] * pixels.shape[1]
+    if count == 0:
+        raise ValueError('Cannot average an empty region')
+
+    # Sum rows first so the accumulator stays small, then reduce columns
+    totals = pixels.sum(axis=0, dtype=np.uint64).sum(axis=0)
+    return tuple(int(t) // count for t in totals[:3])
+
+
+def histogram_median(hist):
+    """Per-channel median of (channels, 256) value histograms"""
+    hist = np.asarray(hist, dtype=np.float64)
+    cumulative = np.cumsum(hist, axis=-1)
+    half = cumulative[..., -1:] / 2
+    return (cumulative < half).sum(axis=-1)
+
+
+def histogram_trimmed_mean(hist, trim=0.1):
+    """
+    Per-channel mean of (channels, 256) value histograms after dropping
+    `trim` of the samples from each tail
+    """
+    hist = np.asarray(hist, dtype=np.float64)
+    total = hist.sum(axis=-1, keepdims=True)
+    low, high = total * trim, total * (1 - trim)
+
+    # Portion of each bin that falls inside the [low, high) sample range
+    upper = np.cumsum(hist, axis=-1)
+    lower = upper - hist
+    kept = np.clip(np.minimum(upper, high) - np.maximum(lower, low), 0, None)
+
+    values = np.arange(hist.shape[-1])
+    return (kept * values).sum(axis=-1) / np.maximum(kept.sum(axis=-1), 1)
+
+
+def rgb_to_hex(rgb):
+    """Convert RGB to hex color"""
+    return '#{:02x}{:02x}{:02x}'.format(int(rgb[0]), int(rgb[1]), int(rgb[2]))
+
+
+def analyze_image(img, pixel_budget=None):
+    """
+    Analyze a PIL image using the average colour of its central region.
+    Returns the same fields as the /analyze endpoint.
+    With a pixel budget the image is decoded at reduced resolution.
+    """
+    if pixel_budget:
+        img = open_reduced(img, pixel_budget)
+    img = img.convert('RGB')
+    width, height = img.size
+    left, top, right, bottom = center_box(width, height)
+
+    # Slice the decoded buffer instead of cropping and copying pixel tuples
+    pixels = np.asarray(img)[top:bottom, left:right]
+    rgb = average_rgb(pixels)
+    skin_tone, undertone = classify(rgb)
+
+    return {
+        'skin_tone': skin_tone,
+        'undertone': undertone,
+        'rgb': list(rgb),
+        'hex': rgb_to_hex(rgb)
+    }
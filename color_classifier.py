@@ -0,0 +1,121 @@
+"""
+Skin tone and undertone classification shared by every analyzer.
+
+The thresholds live here only. Estimated skin colours (one per face) are
+classified exactly. Raw pixels, where a few misplaced near-threshold
+values do not matter, go through a precomputed quantized RGB lookup table
+in one vectorized call, e.g. the tone histogram of a face. At 64 bins the
+table is evaluated at bin centres, so it disagrees with the exact
+thresholds on about 1.3% of all RGB values for the tone (1.9% for tone
+or undertone); raise LUT_BINS to trade memory for agreement.
+"""
+import threading
+import numpy as np
+
+SKIN_TONES = ('Fair', 'Medium', 'Olive', 'Deep')
+UNDERTONES = ('warm', 'cool', 'neutral')
+
+# Brightness must exceed these for Fair, Medium and Olive; anything else is Deep
+TONE_THRESHOLDS = (200, 160, 120)
+
+# Undertone ratio thresholds: red / (g + b + 1) and blue / (r + g + 1)
+WARM_RED_RATIO = 0.55
+COOL_BLUE_RATIO = 0.35
+
+# Lookup table resolution per channel (must be a power of two <= 256)
+LUT_BINS = 64
+
+_luts = {}
+_lut_lock = threading.Lock()
+
+
+def classify_exact(colors):
+    """
+    Classify an (..., 3) array of RGB colours with the exact thresholds.
+    Returns (tone_index, undertone_index) arrays indexing SKIN_TONES/UNDERTONES.
+    """
+    colors = np.asarray(colors, dtype=np.float64)
+    r, g, b = colors[..., 0], colors[..., 1], colors[..., 2]
+
+    brightness = (r + g + b) / 3
+    tone = np.select(
+        [brightness > threshold for threshold in TONE_THRESHOLDS],
+        range(len(TONE_THRESHOLDS)),
+        default=len(TONE_THRESHOLDS)
+    ).astype(np.uint8)
+
+    red_ratio = r / (g + b + 1)
+    blue_ratio = b / (r + g + 1)
+    undertone = np.select(
+        [red_ratio > WARM_RED_RATIO, blue_ratio > COOL_BLUE_RATIO],
+        [0, 1],
+        default=2
+    ).astype(np.uint8)
+
+    return tone, undertone
+
+
+def get_lut(bins=LUT_BINS):
+    """
+    (bins, bins, bins) uint8 table of tone * 3 + undertone codes, built once
+    from the exact thresholds evaluated at each bin's centre
+    """
+    lut = _luts.get(bins)
+    if lut is not None:
+        return lut
+
+    with _lut_lock:
+        if bins not in _luts:
+            if bins & (bins - 1) or not 0 < bins <= 256:
+                raise ValueError('LUT bins must be a power of two up to 256')
+            step = 256 // bins
+            centers = np.arange(bins) * step + (step - 1) / 2
+            grid = np.stack(np.meshgrid(centers, centers, centers, indexing='ij'), axis=-1)
+            tone, undertone = classify_exact(grid)
+            lut = tone * len(UNDERTONES) + undertone
+            lut.setflags(write=False)
+            _luts[bins] = lut
+        return _luts[bins]
+
+
+def classify_codes(colors, bins=LUT_BINS):
+    """Table lookup for an (..., 3) uint8 RGB array; returns tone * 3 + undertone codes"""
+    colors = np.asarray(colors)
+    if colors.dtype != np.uint8:
+        colors = np.clip(colors, 0, 255).astype(np.uint8)
+
+    shift = 8 - (bins.bit_length() - 1)
+    index = colors >> shift if shift else colors
+    return get_lut(bins)[index[..., 0], index[..., 1], index[..., 2]]
+
+
+def classify_colors(colors, exact=False, bins=LUT_BINS):
+    """
+    Classify many RGB colours in one call.
+    Returns (tone_index, undertone_index) arrays; exact=True skips the table.
+    """
+    if exact:
+        return classify_exact(colors)
+
+    codes = classify_codes(colors, bins)
+    return codes // len(UNDERTONES), codes % len(UNDERTONES)
+
+
+def classify(rgb):
+    """Classify one RGB colour; returns (skin_tone, undertone) names"""
+    tone, undertone = classify_exact(rgb)
+    return SKIN_TONES[int(tone)], UNDERTONES[int(undertone)]
+
+
+def tone_histogram(*pixel_arrays, bins=LUT_BINS):
+    """
+    Fraction of pixels falling in each skin tone across one or more (..., 3)
+    RGB arrays (e.g. views of separate regions, counted without joining them)
+    """
+    counts = np.zeros(len(SKIN_TONES) * len(UNDERTONES), dtype=np.int64)
+    for pixels in pixel_arrays:
+        codes = classify_codes(pixels, bins)
+        counts += np.bincount(codes.ravel(), minlength=counts.size)
+    tone_counts = counts.reshape(len(SKIN_TONES), len(UNDERTONES)).sum(axis=1)
+    total = max(int(tone_counts.sum()), 1)
+    return {tone: round(int(count) / total, 4) for tone, count in zip(SKIN_TONES, tone_counts)}
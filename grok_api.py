@@ -1,27 +1,101 @@
 """Grok API Integration for AI-powered fashion recommendations"""
+import base64
+import json
 import os
-import requests
+import threading
+import time
 from dotenv import load_dotenv
+from circuit_breaker import CLOSED, CircuitOpenError, get_breaker
+from color_classifier import SKIN_TONES, UNDERTONES
+from http_session import PooledSession
+from json_stream import StreamingJSONParser, parse_fields
+from singleflight import SingleFlight
 
 load_dotenv()
 
-class GrokAPI:
-    """Interface for xAI's Grok API"""
+# HTTP read timeouts (seconds); connecting gets CONNECT_TIMEOUT on top
+DEFAULT_TIMEOUT = 30
+RECOMMENDATION_TIMEOUT = 30
+EXPLANATION_TIMEOUT = 15
+CONNECT_TIMEOUT = 5
+
+# Extra time a coalesced caller waits for the in-flight call beyond its HTTP timeout
+COALESCE_GRACE = 5
+
+# Sections a partial (truncated) reply must still contain to be used
+REQUIRED_SECTIONS = ('color_palette', 'outfits')
+
+# Profile values offered by the web UI (templates/index.html). Only profiles
+# built from these are cached, so arbitrary client strings cannot grow the
+# persistent recommendation cache
+GENDERS = ('female', 'male', 'unisex')
+OCCASIONS = ('daily', 'work', 'party', 'wedding', 'date', 'brunch', 'dinner', 'gym',
+             'travel', 'festival', 'interview', 'college', 'shopping', 'beach', 'concert')
+VIBES = ('casual', 'professional', 'party', 'streetwear', 'minimal', 'festive')
+BUDGETS = ('low', 'medium', 'high')
+
+PROFILE_VALUES = tuple(map(frozenset, (SKIN_TONES, UNDERTONES, GENDERS, OCCASIONS, VIBES, BUDGETS)))
+
+def profile_key(skin_tone, undertone, gender, occasion, vibe, budget):
+    """Normalized profile tuple identifying a recommendation request"""
+    return (
+        str(skin_tone).strip().title(),
+        str(undertone).strip().lower(),
+        str(gender).strip().lower(),
+        str(occasion).strip().lower(),
+        str(vibe).strip().lower(),
+        str(budget).strip().lower()
+    )
+
+def is_known_profile(profile):
+    """True when every field of a normalized profile is one the UI offers"""
+    return all(value in values for value, values in zip(profile, PROFILE_VALUES))
+
+def recommendation_cache_key(profile):
+    """Cache key for complete recommendations of a normalized profile"""
+    return 'complete:' + '|'.join(profile)
+
+class GrokBase:
+    """Prompts, payloads and response handling shared by GrokAPI and grok_async.AsyncGrokAPI"""
     
     def __init__(self):
         self.api_key = os.getenv('XAI_API_KEY')
         self.base_url = "https://api.x.ai/v1"
         self.model = "grok-beta"  # or "grok-vision-beta" for image analysis
         
+        # Shared by every Grok client in the process; while open, calls
+        # fail at once with CircuitOpenError and callers fall back
+        self.breaker = get_breaker('grok')
+        
         if not self.api_key:
             print("Warning: XAI_API_KEY not found in environment variables")
     
-    def generate_complete_recommendations(self, skin_tone, undertone, gender, occasion, vibe, budget):
+    def _cache_for(self, profile):
+        """The recommendation cache, or None for a profile outside the known values"""
+        return self.cache if is_known_profile(profile) else None
+    
+    @staticmethod
+    def _upstream_failed(response):
+        """Responses that count against the provider's health"""
+        return response.status_code == 429 or response.status_code >= 500
+    
+    def _retrying(self, latency):
         """
-        Generate complete structured fashion recommendations using Grok
-        Returns: colors, outfits, accessories, hairstyles, explanation
+        Count a failed attempt that is about to be retried against the
+        breaker, so retries cannot hammer a failing provider; raises
+        CircuitOpenError instead of retrying once the circuit has left closed
         """
-        
+        self.breaker.record(True, latency)
+        if self.breaker.state != CLOSED:
+            raise CircuitOpenError(f"{self.breaker.name} circuit opened; not retrying")
+    
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def _complete_payload(self, skin_tone, undertone, gender, occasion, vibe, budget):
         prompt = f"""You are an expert fashion stylist. Generate personalized recommendations for:
 
 Skin Tone: {skin_tone}
@@ -59,75 +133,55 @@ Provide a JSON response with this EXACT structure:
 
 Focus on Indian fashion context. Be specific and practical. Use actual color names and hex codes."""
 
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are an expert fashion stylist. Always respond with valid JSON only, no additional text."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "model": self.model,
-                "stream": False,
-                "temperature": 0.7,
-                "max_tokens": 1500
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                content = result['choices'][0]['message']['content']
-                
-                # Parse JSON from response
-                import json
-                import re
-                
-                # Extract JSON from markdown code blocks if present
-                json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', content, re.DOTALL)
-                if json_match:
-                    content = json_match.group(1)
-                
-                # Parse the JSON
-                recommendations = json.loads(content)
-                
-                return {
-                    'success': True,
-                    'recommendations': recommendations
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': f"API Error: {response.status_code}",
-                    'details': response.text
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are an expert fashion stylist. Always respond with valid JSON only, no additional text."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
                 }
-                
-        except Exception as e:
-            print(f"Grok recommendation error: {e}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
+            ],
+            "model": self.model,
+            "stream": False,
+            "temperature": 0.7,
+            "max_tokens": 1500
+        }
     
-    def generate_style_recommendations(self, skin_tone, undertone, gender, occasion, vibe, budget):
+    def _complete_result(self, response):
         """
-        Generate personalized fashion recommendations using Grok
+        Result dict for a complete-recommendations response. A cut-off or
+        partly malformed reply keeps its recoverable sections and is marked
+        'truncated', as long as the palette and outfits survived; without
+        them it is a failure and callers use the built-in recommendations.
         """
+        if response.status_code != 200:
+            return {
+                'success': False,
+                'error': f"API Error: {response.status_code}",
+                'details': response.text
+            }
+        
+        content = response.json()['choices'][0]['message']['content']
+        recommendations, complete = parse_fields(content)
+        if not recommendations:
+            raise ValueError('No JSON recommendations in response')
+        missing = [name for name in REQUIRED_SECTIONS if not recommendations.get(name)]
+        if missing:
+            raise ValueError(f"Recommendations missing {', '.join(missing)}")
         
+        result = {
+            'success': True,
+            'recommendations': recommendations,
+            'timing': getattr(response, 'timing', None)
+        }
+        if not complete:
+            result['truncated'] = True
+        return result
+    
+    def _style_payload(self, skin_tone, undertone, gender, occasion, vibe, budget):
         prompt = f"""You are a professional fashion stylist. Based on the following information, provide personalized fashion advice:
 
 Skin Tone: {skin_tone}
@@ -146,114 +200,337 @@ Please provide:
 
 Keep the response natural, friendly, and practical. Focus on Indian fashion context and availability."""
 
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
+        return {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are an expert fashion stylist with deep knowledge of color theory, skin tones, and Indian fashion trends."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "model": self.model,
+            "stream": False,
+            "temperature": 0.7
+        }
+    
+    def _style_result(self, response):
+        if response.status_code != 200:
+            return {
+                'success': False,
+                'error': f"API Error: {response.status_code}",
+                'details': response.text
             }
-            
-            payload = {
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are an expert fashion stylist with deep knowledge of color theory, skin tones, and Indian fashion trends."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "model": self.model,
-                "stream": False,
-                "temperature": 0.7
+        
+        result = response.json()
+        return {
+            'success': True,
+            'advice': result['choices'][0]['message']['content'],
+            'model': result.get('model', self.model),
+            'timing': getattr(response, 'timing', None)
+        }
+    
+    @staticmethod
+    def _read_image_base64(image_path):
+        with open(image_path, 'rb') as img_file:
+            return base64.b64encode(img_file.read()).decode('utf-8')
+    
+    def _image_payload(self, image_data):
+        return {
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": "Analyze this person's skin tone, face shape, and provide fashion styling recommendations. Be specific about colors that would suit them."
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/jpeg;base64,{image_data}"
+                            }
+                        }
+                    ]
+                }
+            ],
+            "model": "grok-vision-beta",
+            "stream": False,
+            "temperature": 0.5
+        }
+    
+    def _image_result(self, response):
+        if response.status_code != 200:
+            return {
+                'success': False,
+                'error': f"Vision API Error: {response.status_code}"
             }
-            
-            response = requests.post(
+        
+        return {
+            'success': True,
+            'analysis': response.json()['choices'][0]['message']['content'],
+            'timing': getattr(response, 'timing', None)
+        }
+    
+    def _explanation_payload(self, skin_tone, undertone, color_names, occasion):
+        prompt = f"""In 2-3 friendly sentences, explain why {color_names} colors are perfect for someone with {skin_tone} skin and {undertone} undertones for {occasion} occasions. Be warm and encouraging."""
+        
+        return {
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "model": self.model,
+            "stream": False,
+            "temperature": 0.8,
+            "max_tokens": 150
+        }
+    
+    def _explanation_result(self, response, skin_tone, undertone, color_names, occasion):
+        if response.status_code != 200:
+            # Fallback to default explanation
+            return self._default_explanation(skin_tone, undertone, color_names, occasion)
+        return response.json()['choices'][0]['message']['content'].strip()
+    
+    @staticmethod
+    def _color_names(colors):
+        return ', '.join([c['name'] for c in colors[:3]])
+    
+    @staticmethod
+    def _default_explanation(skin_tone, undertone, color_names, occasion):
+        return f'These {color_names} colors are specially chosen for your {skin_tone.lower()} skin tone with {undertone} undertones. Perfect for {occasion} occasions!'
+
+class GrokAPI(GrokBase):
+    """Interface for xAI's Grok API"""
+    
+    def __init__(self, cache=None, pool_size=None, max_retries=None):
+        super().__init__()
+        
+        # One keep-alive connection pool shared by every call and thread;
+        # 429/5xx responses are retried with backoff, honouring Retry-After
+        self.http = PooledSession(
+            pool_size=pool_size or int(os.getenv('GROK_POOL_SIZE', 10)),
+            max_retries=max_retries if max_retries is not None else int(os.getenv('GROK_MAX_RETRIES', 3)),
+            headers=self._headers()
+        )
+        
+        # Optional result_cache.TieredCache for complete recommendations;
+        # stale entries are served while a background refresh runs
+        self.cache = cache
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        
+        # Concurrent identical requests share one outbound call
+        self.inflight = SingleFlight()
+    
+    def _post(self, payload, timeout=DEFAULT_TIMEOUT, stream=False):
+        """
+        POST a chat completion through the circuit breaker and the pooled
+        session; every attempt, retries included, is recorded with the
+        breaker. response.timing has the call timings.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.breaker.name} circuit is open")
+        
+        attempt_start = time.monotonic()
+        
+        def on_retry():
+            nonlocal attempt_start
+            now = time.monotonic()
+            self._retrying(now - attempt_start)
+            attempt_start = now
+        
+        try:
+            response = self.http.post(
                 f"{self.base_url}/chat/completions",
-                headers=headers,
+                on_retry=on_retry,
                 json=payload,
-                timeout=30
+                stream=stream,
+                timeout=(CONNECT_TIMEOUT, timeout)
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    'success': True,
-                    'advice': result['choices'][0]['message']['content'],
-                    'model': result.get('model', self.model)
-                }
-            else:
+        except CircuitOpenError:
+            raise
+        except Exception:
+            self.breaker.record(True, time.monotonic() - attempt_start)
+            raise
+        self.breaker.record(self._upstream_failed(response), time.monotonic() - attempt_start)
+        return response
+    
+    def generate_complete_recommendations(self, skin_tone, undertone, gender, occasion, vibe, budget,
+                                          max_wait=None):
+        """
+        Generate complete structured fashion recommendations using Grok
+        Returns: colors, outfits, accessories, hairstyles, explanation
+        
+        With max_wait (seconds), gives up waiting after that long and returns
+        an unsuccessful result marked 'pending'; the Grok call keeps running
+        in the background and caches its result for the next request.
+        """
+        profile = profile_key(skin_tone, undertone, gender, occasion, vibe, budget)
+        cache = self._cache_for(profile)
+        if cache is None:
+            return self._fetch_complete_recommendations(profile, max_wait)
+        
+        cache_key = recommendation_cache_key(profile)
+        recommendations, age, fresh = cache.lookup(cache_key)
+        if recommendations is not None:
+            if not fresh:
+                self._refresh_in_background(cache_key, profile)
+            return {
+                'success': True,
+                'recommendations': recommendations,
+                'cached': True,
+                'cache_age': round(age, 1)
+            }
+        
+        return self._fetch_complete_recommendations(profile, max_wait)
+    
+    def _fetch_complete_recommendations(self, profile, max_wait=None):
+        """One Grok call per profile at a time; concurrent callers share its result"""
+        cache = self._cache_for(profile)
+        
+        def fetch():
+            result = self._request_complete_recommendations(*profile)
+            if result.get('success') and not result.get('truncated') and cache is not None:
+                cache.set(recommendation_cache_key(profile), result['recommendations'])
+            return result
+        
+        if max_wait is not None:
+            # Run the call detached so it outlives this caller's wait
+            try:
+                return self.inflight.do(('complete', profile), fetch, timeout=max_wait, detach=True)
+            except TimeoutError:
                 return {
                     'success': False,
-                    'error': f"API Error: {response.status_code}",
-                    'details': response.text
+                    'error': f"No response within {max_wait}s",
+                    'pending': True
                 }
-                
-        except Exception as e:
+        
+        try:
+            return self.inflight.do(('complete', profile), fetch,
+                                    timeout=RECOMMENDATION_TIMEOUT + COALESCE_GRACE)
+        except TimeoutError as e:
             return {
                 'success': False,
                 'error': str(e)
             }
     
-    def analyze_image_with_grok(self, image_path):
+    def stream_complete_recommendations(self, skin_tone, undertone, gender, occasion, vibe, budget):
         """
-        Use Grok Vision to analyze uploaded image
-        (Optional: for enhanced image analysis)
+        Yield (section, value) pairs of the complete recommendations as each
+        top-level section of Grok's streamed JSON finishes parsing. Cached
+        results are yielded at once (a stale one is refreshed in the
+        background). Concurrent requests for the same profile share one
+        upstream stream, which caches its result when it completes.
+        Raises on HTTP or connection errors.
         """
+        profile = profile_key(skin_tone, undertone, gender, occasion, vibe, budget)
+        cache = self._cache_for(profile)
+        if cache is not None:
+            cache_key = recommendation_cache_key(profile)
+            recommendations, _, fresh = cache.lookup(cache_key)
+            if recommendations is not None:
+                if not fresh:
+                    self._refresh_in_background(cache_key, profile)
+                yield from recommendations.items()
+                return
+        
+        yield from self.inflight.stream(('stream', profile), self._stream_upstream, profile,
+                                        timeout=RECOMMENDATION_TIMEOUT + COALESCE_GRACE)
+    
+    def _stream_upstream(self, profile):
+        """One streamed Grok call; caches the result if the whole reply arrived"""
+        payload = self._complete_payload(*profile)
+        payload['stream'] = True
+        response = self._post(payload, timeout=RECOMMENDATION_TIMEOUT, stream=True)
         
         try:
-            # Read image and convert to base64
-            import base64
-            with open(image_path, 'rb') as img_file:
-                image_data = base64.b64encode(img_file.read()).decode('utf-8')
+            if response.status_code != 200:
+                raise RuntimeError(f"API Error: {response.status_code}")
             
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            parser = StreamingJSONParser()
+            for text in self._stream_deltas(response):
+                yield from parser.feed(text)
             
-            payload = {
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "Analyze this person's skin tone, face shape, and provide fashion styling recommendations. Be specific about colors that would suit them."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_data}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                "model": "grok-vision-beta",
-                "stream": False,
-                "temperature": 0.5
+            # A cut-off stream still yields the complete part of its last section
+            yield from parser.close()
+            cache = self._cache_for(profile)
+            if parser.complete and cache is not None:
+                cache.set(recommendation_cache_key(profile), parser.fields)
+        finally:
+            response.close()
+    
+    @staticmethod
+    def _stream_deltas(response):
+        """Content fragments of a streamed (server-sent events) chat completion"""
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                return
+            choices = json.loads(data).get('choices') or [{}]
+            content = choices[0].get('delta', {}).get('content')
+            if content:
+                yield content
+    
+    def _refresh_in_background(self, cache_key, profile):
+        """Re-fetch a stale cache entry once, without blocking the caller"""
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+        
+        def refresh():
+            try:
+                self._fetch_complete_recommendations(profile)
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(cache_key)
+        
+        threading.Thread(target=refresh, daemon=True).start()
+    
+    def _request_complete_recommendations(self, skin_tone, undertone, gender, occasion, vibe, budget):
+        """Call Grok for complete recommendations (no caching)"""
+        try:
+            payload = self._complete_payload(skin_tone, undertone, gender, occasion, vibe, budget)
+            response = self._post(payload, timeout=RECOMMENDATION_TIMEOUT)
+            return self._complete_result(response)
+        
+        except Exception as e:
+            print(f"Grok recommendation error: {e}")
+            return {
+                'success': False,
+                'error': str(e)
             }
-            
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    'success': True,
-                    'analysis': result['choices'][0]['message']['content']
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': f"Vision API Error: {response.status_code}"
-                }
-                
+    
+    def generate_style_recommendations(self, skin_tone, undertone, gender, occasion, vibe, budget):
+        """
+        Generate personalized fashion recommendations using Grok
+        """
+        try:
+            payload = self._style_payload(skin_tone, undertone, gender, occasion, vibe, budget)
+            return self._style_result(self._post(payload))
+        
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def analyze_image_with_grok(self, image_path):
+        """
+        Use Grok Vision to analyze uploaded image
+        (Optional: for enhanced image analysis)
+        """
+        try:
+            payload = self._image_payload(self._read_image_base64(image_path))
+            return self._image_result(self._post(payload))
+        
         except Exception as e:
             return {
                 'success': False,
@@ -265,46 +542,30 @@ Keep the response natural, friendly, and practical. Focus on Indian fashion cont
         Generate a personalized explanation for why certain colors work
         """
         
-        color_names = ', '.join([c['name'] for c in colors[:3]])
-        
-        prompt = f"""In 2-3 friendly sentences, explain why {color_names} colors are perfect for someone with {skin_tone} skin and {undertone} undertones for {occasion} occasions. Be warm and encouraging."""
+        color_names = self._color_names(colors)
         
+        # Identical explanations requested concurrently share one call
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "model": self.model,
-                "stream": False,
-                "temperature": 0.8,
-                "max_tokens": 150
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=15
+            return self.inflight.do(
+                ('explanation', skin_tone, undertone, color_names, occasion),
+                self._request_personalized_explanation,
+                skin_tone, undertone, color_names, occasion,
+                timeout=EXPLANATION_TIMEOUT + COALESCE_GRACE
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content'].strip()
-            else:
-                # Fallback to default explanation
-                return f'These {color_names} colors are specially chosen for your {skin_tone.lower()} skin tone with {undertone} undertones. Perfect for {occasion} occasions!'
-                
+        except TimeoutError as e:
+            print(f"Explanation generation error: {e}")
+            return self._default_explanation(skin_tone, undertone, color_names, occasion)
+    
+    def _request_personalized_explanation(self, skin_tone, undertone, color_names, occasion):
+        """Call Grok for the explanation (no coalescing)"""
+        try:
+            payload = self._explanation_payload(skin_tone, undertone, color_names, occasion)
+            response = self._post(payload, timeout=EXPLANATION_TIMEOUT)
+            return self._explanation_result(response, skin_tone, undertone, color_names, occasion)
+        
         except Exception as e:
             print(f"Explanation generation error: {e}")
-            return f'These {color_names} colors are specially chosen for your {skin_tone.lower()} skin tone with {undertone} undertones. Perfect for {occasion} occasions!'
+            return self._default_explanation(skin_tone, undertone, color_names, occasion)
 
 # Test function
 if __name__ == "__main__":
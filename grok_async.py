@@ -0,0 +1,286 @@
+"""Asyncio client for xAI's Grok API (optional; requires httpx)"""
+import asyncio
+import email.utils
+import os
+import time
+from grok_api import (
+    COALESCE_GRACE, CONNECT_TIMEOUT, DEFAULT_TIMEOUT, EXPLANATION_TIMEOUT, RECOMMENDATION_TIMEOUT,
+    GrokBase, profile_key, recommendation_cache_key
+)
+from circuit_breaker import CircuitOpenError
+from http_session import MAX_RETRY_AFTER, RETRY_STATUSES
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Seconds before the first retry; doubles on every further attempt
+RETRY_BACKOFF = 0.5
+
+
+class _Flight:
+    """An in-flight upstream call and how many callers await it"""
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncGrokAPI(GrokBase):
+    """
+    Async counterpart of GrokAPI, sharing its prompts and response handling.
+    All calls share one httpx connection pool, a semaphore caps concurrent
+    upstream requests and identical in-flight calls are coalesced into one
+    task, which is cancelled once every caller waiting for it has gone.
+    """
+
+    def __init__(self, cache=None, pool_size=None, max_concurrency=None, max_retries=None):
+        if httpx is None:
+            raise ImportError('AsyncGrokAPI requires httpx (pip install httpx)')
+        super().__init__()
+
+        self.max_concurrency = max_concurrency or int(os.getenv('GROK_MAX_CONCURRENCY', 256))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('GROK_MAX_RETRIES', 3))
+
+        # Up to max_concurrency connections open at once, pool_size kept alive
+        # between calls; the semaphore already bounds waiting for the pool
+        self.client = httpx.AsyncClient(
+            headers=self._headers(),
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=pool_size or int(os.getenv('GROK_POOL_SIZE', 10))
+            ),
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=CONNECT_TIMEOUT, pool=None)
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        # Optional result_cache.TieredCache, shared with GrokAPI if desired
+        self.cache = cache
+        self._inflight = {}
+        self._background = set()
+
+    async def _post(self, payload, timeout=DEFAULT_TIMEOUT):
+        """
+        _send() through the circuit breaker; raises CircuitOpenError without
+        calling out while the provider is marked unhealthy
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.breaker.name} circuit is open")
+
+        try:
+            return await self._send(payload, timeout)
+        except asyncio.CancelledError:
+            # Abandoned by the caller: says nothing about the provider
+            self.breaker.release()
+            raise
+
+    async def _send(self, payload, timeout):
+        """
+        POST a chat completion under the concurrency cap. 429/5xx responses and
+        connection errors are retried with exponential backoff, honouring
+        Retry-After; the semaphore is not held while backing off. Errors
+        after the request was sent, such as read timeouts, are not retried.
+        Every attempt is recorded with the circuit breaker, and retrying
+        stops with CircuitOpenError once the circuit leaves closed.
+        response.timing has the total seconds and the number of retries.
+        """
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt_start = time.monotonic()
+            try:
+                async with self._semaphore:
+                    response = await self.client.post(
+                        f"{self.base_url}/chat/completions",
+                        json=payload,
+                        timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT, pool=None)
+                    )
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if attempt >= self.max_retries:
+                    self.breaker.record(True, time.monotonic() - attempt_start)
+                    raise
+                delay = None
+            except Exception:
+                self.breaker.record(True, time.monotonic() - attempt_start)
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    self.breaker.record(self._upstream_failed(response), time.monotonic() - attempt_start)
+                    response.timing = {'total': round(time.perf_counter() - start, 4), 'retries': attempt}
+                    return response
+                delay = self._retry_after(response)
+
+            self._retrying(time.monotonic() - attempt_start)
+            if delay is None:
+                delay = RETRY_BACKOFF * 2 ** attempt
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _retry_after(response):
+        """Retry-After in seconds (delta or HTTP date), capped at MAX_RETRY_AFTER"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(max(0.0, seconds), MAX_RETRY_AFTER)
+
+    async def _coalesced(self, key, factory, timeout):
+        """
+        Await the shared task for `key`, starting it with factory() if none is
+        in flight. Raises TimeoutError after `timeout` seconds for this caller
+        only; the task is cancelled when its last waiter leaves early.
+        """
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = self._inflight[key] = _Flight(asyncio.ensure_future(factory()))
+            flight.task.add_done_callback(lambda _, f=flight: self._forget(key, f))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), timeout)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _forget(self, key, flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    async def generate_complete_recommendations(self, skin_tone, undertone, gender, occasion, vibe, budget):
+        """
+        Generate complete structured fashion recommendations using Grok
+        Returns: colors, outfits, accessories, hairstyles, explanation
+        """
+        profile = profile_key(skin_tone, undertone, gender, occasion, vibe, budget)
+        cache = self._cache_for(profile)
+        if cache is not None:
+            recommendations, age, fresh = cache.lookup(recommendation_cache_key(profile))
+            if recommendations is not None:
+                if not fresh and ('complete', profile) not in self._inflight:
+                    self._refresh_in_background(profile)
+                return {
+                    'success': True,
+                    'recommendations': recommendations,
+                    'cached': True,
+                    'cache_age': round(age, 1)
+                }
+
+        return await self._fetch_complete_recommendations(profile)
+
+    async def _fetch_complete_recommendations(self, profile):
+        cache = self._cache_for(profile)
+
+        async def fetch():
+            result = await self._request_complete_recommendations(*profile)
+            if result.get('success') and not result.get('truncated') and cache is not None:
+                cache.set(recommendation_cache_key(profile), result['recommendations'])
+            return result
+
+        try:
+            return await self._coalesced(('complete', profile), fetch,
+                                         RECOMMENDATION_TIMEOUT + COALESCE_GRACE)
+        except asyncio.TimeoutError:
+            return {
+                'success': False,
+                'error': 'Timed out waiting for Grok recommendations'
+            }
+
+    def _refresh_in_background(self, profile):
+        """Re-fetch a stale cache entry without blocking the caller"""
+        task = asyncio.ensure_future(self._fetch_complete_recommendations(profile))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _request_complete_recommendations(self, skin_tone, undertone, gender, occasion, vibe, budget):
+        """Call Grok for complete recommendations (no caching)"""
+        try:
+            payload = self._complete_payload(skin_tone, undertone, gender, occasion, vibe, budget)
+            response = await self._post(payload, timeout=RECOMMENDATION_TIMEOUT)
+            return self._complete_result(response)
+        except Exception as e:
+            print(f"Grok recommendation error: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    async def generate_style_recommendations(self, skin_tone, undertone, gender, occasion, vibe, budget):
+        """Generate personalized fashion recommendations using Grok"""
+        try:
+            payload = self._style_payload(skin_tone, undertone, gender, occasion, vibe, budget)
+            return self._style_result(await self._post(payload))
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    async def analyze_image_with_grok(self, image_path):
+        """Use Grok Vision to analyze an image file"""
+        try:
+            image_data = await asyncio.to_thread(self._read_image_base64, image_path)
+            return self._image_result(await self._post(self._image_payload(image_data)))
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    async def get_personalized_explanation(self, skin_tone, undertone, colors, occasion):
+        """Generate a personalized explanation for why certain colors work"""
+        color_names = self._color_names(colors)
+
+        async def fetch():
+            try:
+                payload = self._explanation_payload(skin_tone, undertone, color_names, occasion)
+                response = await self._post(payload, timeout=EXPLANATION_TIMEOUT)
+                return self._explanation_result(response, skin_tone, undertone, color_names, occasion)
+            except Exception as e:
+                print(f"Explanation generation error: {e}")
+                return self._default_explanation(skin_tone, undertone, color_names, occasion)
+
+        try:
+            return await self._coalesced(('explanation', skin_tone, undertone, color_names, occasion),
+                                         fetch, EXPLANATION_TIMEOUT + COALESCE_GRACE)
+        except asyncio.TimeoutError:
+            print("Explanation generation error: timed out")
+            return self._default_explanation(skin_tone, undertone, color_names, occasion)
+
+    async def aclose(self):
+        """Cancel background refreshes and close the connection pool"""
+        for task in list(self._background):
+            task.cancel()
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+# Test function
+if __name__ == "__main__":
+    async def main():
+        async with AsyncGrokAPI() as grok:
+            result = await grok.generate_style_recommendations(
+                skin_tone="Medium",
+                undertone="warm",
+                gender="female",
+                occasion="party",
+                vibe="elegant",
+                budget="medium"
+            )
+            print("Async Grok API Test:")
+            print(result)
+
+    asyncio.run(main())
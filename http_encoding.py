@@ -0,0 +1,235 @@
+"""
+HTTP response compression and validators.
+
+EncodedBody holds a body encoded once and served many times; ResponseCompressor
+is an after_request hook that compresses JSON, HTML, CSS and JS responses
+(brotli when the brotli package is installed, else gzip), adds strong ETags
+and answers conditional requests. Static files are compressed once per file
+version, or served from precompressed .br/.gz siblings written by
+`python http_encoding.py static`.
+"""
+import gzip
+import hashlib
+import os
+import sys
+from flask import Response, request
+from result_cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = 512
+
+COMPRESSIBLE_TYPES = frozenset({
+    'application/json', 'application/javascript', 'text/javascript',
+    'text/css', 'text/html', 'text/plain', 'image/svg+xml'
+})
+
+# In order of preference
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# (gzip level, brotli quality): fast for per-request work, maximal for bodies
+# compressed once and served many times
+FAST = (6, 5)
+BEST = (9, 11)
+
+
+def compress(data, encoding, levels=FAST):
+    """`data` compressed with 'br' or 'gzip'"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=levels[1])
+    # mtime=0 keeps the compressed bytes (and so the ETag) reproducible
+    return gzip.compress(data, compresslevel=levels[0], mtime=0)
+
+
+def choose_encoding(req, offered):
+    """The preferred encoding in `offered` that `req` accepts, or None"""
+    for encoding in offered:
+        if req.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def body_etag(data):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def not_modified(etag, last_modified=None):
+    """Empty 304 carrying the validators of the representation it stands for"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+class EncodedBody:
+    """
+    A response body serialized ahead of time: the identity bytes, a
+    compressed variant per encoding when it is smaller, and a strong ETag
+    for each. Serving it is a header check and a bytes copy, with no JSON
+    encoding or compression.
+    """
+
+    __slots__ = ('body', 'etag', 'variants', 'mimetype')
+
+    def __init__(self, body, mimetype='application/json', min_size=COMPRESS_MIN_SIZE):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = body_etag(body)
+        self.variants = {}
+
+        if len(body) >= min_size:
+            for encoding in ENCODINGS:
+                compressed = compress(body, encoding, BEST)
+                if len(compressed) < len(body):
+                    self.variants[encoding] = (compressed, f'{self.etag}-{encoding}')
+
+    def respond(self, request):
+        """
+        Response for `request`: the best accepted encoding, and 304 Not
+        Modified when If-None-Match already names the chosen variant
+        """
+        encoding = choose_encoding(request, self.variants)
+        body, etag = self.variants[encoding] if encoding else (self.body, self.etag)
+
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+
+        response = Response(body, mimetype=self.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def __len__(self):
+        return len(self.body)
+
+
+class ResponseCompressor:
+    """
+    after_request hook. Compresses eligible 200 responses above `min_size`
+    and gives them a strong ETag (per encoding), answering a matching
+    If-None-Match on GET/HEAD with 304. Streamed responses (server-sent
+    events), responses that already have a Content-Encoding and other
+    media types pass through untouched.
+    """
+
+    def __init__(self, static_folder=None, min_size=COMPRESS_MIN_SIZE, static_cache_size=64):
+        self.static_folder = static_folder
+        self.min_size = min_size
+        # (path, encoding, mtime_ns, size) -> compressed bytes
+        self.static_variants = LRUCache(static_cache_size)
+
+    def __call__(self, response):
+        if response.status_code != 200 or 'Content-Encoding' in response.headers:
+            return response
+        if response.mimetype not in COMPRESSIBLE_TYPES:
+            return response
+        if request.endpoint == 'static' and self.static_folder:
+            return self._static(response)
+        if response.is_streamed:
+            return response
+
+        data = response.get_data()
+        encoding = choose_encoding(request, ENCODINGS) if len(data) >= self.min_size else None
+        etag, _ = response.get_etag()
+        etag = etag or body_etag(data)
+        if encoding:
+            etag = f'{etag}-{encoding}'
+
+        if request.method in ('GET', 'HEAD') and request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+
+        if encoding:
+            compressed = compress(data, encoding)
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+        response.set_etag(etag)
+        return response
+
+    def _static(self, response):
+        """Swap a static file response for its compressed variant"""
+        path = os.path.join(self.static_folder, request.view_args['filename'])
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return response
+        if stat.st_size < self.min_size:
+            return response
+
+        encoding = choose_encoding(request, ENCODINGS)
+        if encoding is None:
+            return response
+
+        etag, _ = response.get_etag()
+        etag = f'{etag}-{encoding}'
+        if request.if_none_match.contains_weak(etag):
+            response.close()
+            return not_modified(etag, response.last_modified)
+
+        data = self._static_variant(path, stat, encoding)
+        response.close()
+        response.direct_passthrough = False
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def _static_variant(self, path, stat, encoding):
+        """
+        Compressed bytes of a static file: a precompressed sibling if it is
+        at least as new as the file, else compressed here once per version
+        """
+        key = (path, encoding, stat.st_mtime_ns, stat.st_size)
+        data = self.static_variants.get(key)
+        if data is not None:
+            return data
+
+        sibling = path + SUFFIXES[encoding]
+        try:
+            fresh = os.stat(sibling).st_mtime_ns >= stat.st_mtime_ns
+        except OSError:
+            fresh = False
+        if fresh:
+            with open(sibling, 'rb') as f:
+                data = f.read()
+        else:
+            with open(path, 'rb') as f:
+                data = compress(f.read(), encoding, BEST)
+
+        self.static_variants.set(key, data)
+        return data
+
+
+def precompress(folder):
+    """Write .br/.gz siblings for every compressible file under `folder`"""
+    types = {'.css', '.js', '.html', '.json', '.svg', '.txt'}
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if os.path.splitext(name)[1] not in types:
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < COMPRESS_MIN_SIZE:
+                continue
+            for encoding in ENCODINGS:
+                compressed = compress(data, encoding, BEST)
+                with open(path + SUFFIXES[encoding], 'wb') as f:
+                    f.write(compressed)
+                print(f"{path}{SUFFIXES[encoding]}: {len(data):,} -> {len(compressed):,} bytes")
+
+
+if __name__ == '__main__':
+    precompress(sys.argv[1] if len(sys.argv) > 1 else 'static')
@@ -0,0 +1,175 @@
+"""Pooled keep-alive HTTP session with retries and per-call connection timing"""
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+# Responses worth retrying: rate limited or a transient upstream failure
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Longest Retry-After (seconds) we are willing to sleep before a retry
+MAX_RETRY_AFTER = 30
+
+# Connection setup time of the current call, per thread
+_local = threading.local()
+
+
+def _record_connect(elapsed):
+    _local.connect_time = getattr(_local, 'connect_time', 0.0) + elapsed
+    _local.connects = getattr(_local, 'connects', 0) + 1
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(time.perf_counter() - start)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """Times TCP connect plus the TLS handshake"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(time.perf_counter() - start)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools open timed connections"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool
+        }
+
+
+class BoundedRetry(Retry):
+    """
+    Retry that honours Retry-After but never sleeps longer than MAX_RETRY_AFTER,
+    and counts the retries of the current call (even one that ends in an error).
+    The call's on_retry hook runs before each retry; an exception it raises
+    ends the call without further attempts.
+    """
+
+    def increment(self, *args, **kwargs):
+        new_retry = super().increment(*args, **kwargs)
+        _local.retries = getattr(_local, 'retries', 0) + 1
+        if _local.on_retry is not None:
+            _local.on_retry()
+        return new_retry
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+
+class PooledSession:
+    """
+    Thread-safe requests.Session with a bounded keep-alive connection pool
+    and exponential-backoff retries on 429/5xx and connection errors.
+    Errors after the request was sent (read timeouts, dropped responses)
+    are not retried: the upstream may already be generating (and billing)
+    the answer.
+    Every call gets a `timing` dict on its response and feeds stats().
+    """
+
+    def __init__(self, pool_size=10, max_retries=3, backoff_factor=0.5, headers=None):
+        retry = BoundedRetry(
+            total=max_retries,
+            read=False,  # never resend after a read error; raise it as is
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,  # chat completions are safe to resend
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = TimedHTTPAdapter(pool_connections=4, pool_maxsize=pool_size,
+                                   max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+        self._lock = threading.Lock()
+        self._counters = {'requests': 0, 'errors': 0, 'retries': 0,
+                          'new_connections': 0, 'reused_connections': 0}
+        self._times = {'connect': 0.0, 'read': 0.0, 'total': 0.0}
+
+    def post(self, url, on_retry=None, **kwargs):
+        """
+        requests.post through the pool. response.timing holds seconds spent
+        connecting (TCP + TLS, 0 on a reused connection), reading (request,
+        server time and body, including any retry backoff) and in total.
+        on_retry() is called before every retry and may raise to stop them.
+        """
+        _local.connect_time = 0.0
+        _local.connects = 0
+        _local.retries = 0
+        _local.on_retry = on_retry
+        start = time.perf_counter()
+        try:
+            response = self.session.post(url, **kwargs)
+        except Exception:
+            self._record(time.perf_counter() - start, _local.retries, failed=True)
+            raise
+        finally:
+            _local.on_retry = None
+
+        response.timing = self._record(time.perf_counter() - start, _local.retries)
+        return response
+
+    def _record(self, total, retries, failed=False):
+        connect = _local.connect_time
+        timing = {
+            'connect': round(connect, 4),
+            'read': round(max(0.0, total - connect), 4),
+            'total': round(total, 4),
+            'new_connections': _local.connects,
+            'retries': retries
+        }
+        with self._lock:
+            self._counters['requests'] += 1
+            self._counters['errors'] += failed
+            self._counters['retries'] += retries
+            self._counters['new_connections'] += _local.connects
+            self._counters['reused_connections'] += not failed and _local.connects == 0
+            self._times['connect'] += connect
+            self._times['read'] += timing['read']
+            self._times['total'] += total
+        return timing
+
+    def stats(self):
+        """Request counts, connection reuse and average connect/read/total seconds"""
+        with self._lock:
+            stats = dict(self._counters)
+            times = dict(self._times)
+
+        count = stats['requests']
+        for name, value in times.items():
+            stats[f'avg_{name}'] = round(value / count, 4) if count else 0.0
+        return stats
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,117 @@
+"""
+Incremental parsing of a JSON object streamed by an LLM.
+
+Chunks are fed as they arrive and every top-level "key": value pair is
+returned as soon as its value closes, so callers can use each section
+before the completion finishes. Text around the object (markdown fences,
+chatter) is ignored, and a truncated or malformed tail only loses the
+fields it touches.
+"""
+import json
+
+
+class StreamingJSONParser:
+    """Emits the completed top-level fields of one streamed JSON object"""
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.stack = []            # open containers, '{' or '['
+        self.in_string = False
+        self.escaped = False
+        self.section_start = None  # buffer index where the current field starts
+        self.item_end = None       # end of the last complete element of a top-level array
+        self.fields = {}
+        self.closed = False        # the object's final brace was seen
+        self.broken = False        # a closer did not match its opener; parsing stopped
+        self.malformed = 0
+
+    def feed(self, chunk):
+        """Consume a chunk of text; returns the (key, value) fields it completed"""
+        self.buffer += chunk
+        completed = []
+
+        while self.pos < len(self.buffer) and not (self.closed or self.broken):
+            ch = self.buffer[self.pos]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif not self.stack:
+                # Skip anything before the object, such as ```json
+                if ch == '{':
+                    self.stack.append('{')
+                    self.section_start = self.pos + 1
+            elif ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.stack.append(ch)
+            elif ch in '}]':
+                if self.stack.pop() != ('{' if ch == '}' else '['):
+                    # Nesting is lost: nothing after this point can be trusted
+                    print(f"Mismatched '{ch}' at offset {self.pos}; ignoring the rest")
+                    self.broken = True
+                    self.malformed += 1
+                    break
+                if not self.stack:
+                    completed.extend(self._emit(self.pos))
+                    self.closed = True
+                elif len(self.stack) == 2:
+                    self.item_end = self.pos + 1
+            elif ch == ',':
+                if len(self.stack) == 1:
+                    completed.extend(self._emit(self.pos))
+                    self.section_start = self.pos + 1
+                elif len(self.stack) == 2:
+                    self.item_end = self.pos
+            self.pos += 1
+
+        return completed
+
+    def _emit(self, end, suffix=''):
+        fragment = self.buffer[self.section_start:end].strip()
+        self.item_end = None
+        if not fragment:
+            return []
+        try:
+            fields = json.loads('{' + fragment + suffix + '}')
+        except json.JSONDecodeError as e:
+            print(f"Skipping malformed field: {e}")
+            self.malformed += 1
+            return []
+        self.fields.update(fields)
+        return list(fields.items())
+
+    def close(self):
+        """
+        End of input. If the object was cut off inside a top-level array,
+        returns that field with its complete elements (and nothing else).
+        """
+        if self.closed or self.broken or self.section_start is None:
+            return []
+
+        completed = []
+        if len(self.stack) >= 2 and self.stack[1] == '[' and self.item_end is not None:
+            completed = self._emit(self.item_end, ']')
+        self.section_start = None
+        return completed
+
+    @property
+    def complete(self):
+        """The whole object arrived and every field parsed"""
+        return self.closed and not self.malformed
+
+
+def parse_fields(text):
+    """
+    Parse a complete LLM reply in one go.
+    Returns (fields, complete): every recoverable top-level field, and
+    whether the object was well formed to its closing brace.
+    """
+    parser = StreamingJSONParser()
+    parser.feed(text)
+    parser.close()
+    return parser.fields, parser.complete
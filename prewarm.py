@@ -0,0 +1,198 @@
+"""
+Precompute recommendations for every profile combination.
+
+Walks skin tone x undertone x gender x occasion x vibe x budget, asks the
+configured AI provider for each missing or expired profile (bounded
+concurrency, rate limited), validates the result and stores it in the
+recommendation cache database that server_simple loads at startup.
+Re-running only fills in what is missing or expired.
+
+    python prewarm.py --provider grok --concurrency 4 --rate 2
+"""
+import argparse
+import itertools
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from color_classifier import SKIN_TONES, UNDERTONES
+from grok_api import BUDGETS, GENDERS, OCCASIONS, VIBES, profile_key, recommendation_cache_key
+from result_cache import SQLiteStore
+
+load_dotenv()
+
+HEX_COLOR = re.compile(r'^#[0-9A-Fa-f]{6}$')
+
+
+class RateLimiter:
+    """Token bucket shared by all worker threads"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def all_profiles():
+    """Every normalized profile tuple, in a stable order"""
+    for combo in itertools.product(SKIN_TONES, UNDERTONES, GENDERS, OCCASIONS, VIBES, BUDGETS):
+        yield profile_key(*combo)
+
+
+def normalize_recommendations(result):
+    """Bring a Grok or Gemini result into the Grok recommendations shape"""
+    return {
+        'color_palette': result.get('color_palette', []),
+        'outfits': result.get('outfits', []),
+        'accessories': result.get('accessories', []),
+        'hairstyles': result.get('hairstyles', result.get('hairstyle', [])),
+        'explanation': result.get('explanation', '')
+    }
+
+
+def validate_recommendations(rec):
+    """Return a list of problems; empty when the recommendation is usable"""
+    problems = []
+
+    palette = rec.get('color_palette')
+    if not isinstance(palette, list) or not palette:
+        problems.append('color_palette missing')
+    elif not all(isinstance(c, dict) and c.get('name') and HEX_COLOR.match(str(c.get('hex', '')))
+                 for c in palette):
+        problems.append('color_palette entries need a name and #RRGGBB hex')
+
+    outfits = rec.get('outfits')
+    if not isinstance(outfits, list) or not outfits:
+        problems.append('outfits missing')
+    elif not all(isinstance(o, dict) and o.get('name') and isinstance(o.get('items'), list)
+                 for o in outfits):
+        problems.append('outfits need a name and items')
+
+    for field in ('accessories', 'hairstyles'):
+        if not isinstance(rec.get(field), list) or not rec[field]:
+            problems.append(f'{field} missing')
+
+    if not isinstance(rec.get('explanation'), str) or not rec['explanation'].strip():
+        problems.append('explanation missing')
+
+    return problems
+
+
+def make_provider(name):
+    """Callable mapping a profile tuple to (recommendations or None, error)"""
+    if name == 'grok':
+        from grok_api import GrokAPI
+        grok = GrokAPI()
+        if not grok.api_key:
+            raise SystemExit('XAI_API_KEY is not set')
+
+        def call_grok(profile):
+            result = grok._request_complete_recommendations(*profile)
+            if not result.get('success'):
+                return None, result.get('error', 'unknown error')
+            if result.get('truncated'):
+                return None, 'truncated response'
+            return normalize_recommendations(result['recommendations']), None
+        return call_grok
+
+    if name == 'gemini':
+        from ai_stylist import AIStylist
+        stylist = AIStylist()
+        if not stylist.model:
+            raise SystemExit('GEMINI_API_KEY is not set')
+
+        def call_gemini(profile):
+            skin_tone, undertone, gender, occasion, vibe, budget = profile
+            result = stylist.generate_recommendations(
+                skin_tone, undertone, gender=gender, vibe=vibe, budget=budget, occasion=occasion
+            )
+            if result.get('source') != 'gemini':
+                return None, 'Gemini call failed (fallback returned)'
+            if result.get('truncated'):
+                return None, 'truncated response'
+            return normalize_recommendations(result), None
+        return call_gemini
+
+    raise SystemExit(f'Unknown provider: {name}')
+
+
+def prewarm(provider, store, ttl, concurrency=4, rate=2.0, limit=None):
+    """Fill `store` with every missing or expired profile; returns counters"""
+    profiles = list(all_profiles())
+    fresh = {key for key, _, _ in store.items(newer_than=time.time() - ttl)}
+    pending = [p for p in profiles if recommendation_cache_key(p) not in fresh]
+    if limit:
+        pending = pending[:limit]
+
+    print(f"{len(profiles)} profiles: {len(fresh)} fresh, {len(pending)} to generate")
+
+    limiter = RateLimiter(rate, burst=concurrency)
+    counters = {'stored': 0, 'invalid': 0, 'failed': 0}
+
+    def work(profile):
+        limiter.acquire()
+        try:
+            return profile, *provider(profile)
+        except Exception as e:
+            return profile, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(work, profile) for profile in pending]
+        for done, future in enumerate(as_completed(futures), 1):
+            profile, rec, error = future.result()
+            label = '/'.join(profile)
+            if rec is None:
+                counters['failed'] += 1
+                print(f"[{done}/{len(pending)}] {label}: failed ({error})")
+                continue
+
+            problems = validate_recommendations(rec)
+            if problems:
+                counters['invalid'] += 1
+                print(f"[{done}/{len(pending)}] {label}: invalid ({'; '.join(problems)})")
+                continue
+
+            # Written as each result arrives, so an interrupted run resumes here
+            store.set(recommendation_cache_key(profile), rec)
+            counters['stored'] += 1
+            if done % 50 == 0 or done == len(pending):
+                print(f"[{done}/{len(pending)}] stored {counters['stored']}")
+
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--provider', choices=['grok', 'gemini'], default='grok')
+    parser.add_argument('--db', default='data/recommendation_cache.db')
+    parser.add_argument('--table', default='recommendation_cache')
+    parser.add_argument('--ttl', type=float, default=7 * 24 * 3600,
+                        help='regenerate entries older than this many seconds')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=2.0, help='max requests per second')
+    parser.add_argument('--limit', type=int, help='generate at most this many profiles')
+    args = parser.parse_args()
+
+    provider = make_provider(args.provider)
+    store = SQLiteStore(args.db, args.table)
+    counters = prewarm(provider, store, args.ttl, args.concurrency, args.rate, args.limit)
+    print(f"Done: {counters}")
+
+
+if __name__ == '__main__':
+    main()
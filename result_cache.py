@@ -0,0 +1,292 @@
+"""Result caches: bounded in-memory LRU with an optional SQLite tier, TTL and stale reads"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+# The SQLite tier is pruned once per this many writes
+PRUNE_EVERY = 100
+
+
+def sha256_bytes(data):
+    """SHA-256 hex digest of an in-memory buffer"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_stream(stream, chunk_size=HASH_CHUNK_SIZE):
+    """Streaming SHA-256 of a file-like object; rewinds it afterwards"""
+    start = stream.tell()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    stream.seek(start)
+    return digest.hexdigest()
+
+
+def sha256_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """Streaming SHA-256 of a file on disk"""
+    with open(path, 'rb') as f:
+        return sha256_stream(f, chunk_size)
+
+
+class LRUCache:
+    """Thread-safe bounded in-memory LRU cache"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value or None"""
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteStore:
+    """Persistent JSON key/value table in SQLite"""
+
+    def __init__(self, db_path='data/styleai.db', table='result_cache'):
+        self.db_path = db_path
+        self.table = table
+        self._init_database()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _init_database(self):
+        """Create the cache table"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def get(self, key):
+        """Return (value, stored_at) or None"""
+        conn = self._connect()
+        row = conn.execute(
+            f'SELECT value, stored_at FROM {self.table} WHERE key = ?', (key,)
+        ).fetchone()
+        conn.close()
+
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def set(self, key, value, stored_at=None):
+        conn = self._connect()
+        conn.execute(
+            f'INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)',
+            (key, json.dumps(value, separators=(',', ':')), stored_at or time.time())
+        )
+        conn.commit()
+        conn.close()
+
+    def prune(self, older_than=None, max_rows=None):
+        """Delete rows stored before `older_than`, then all but the newest `max_rows`; returns the count"""
+        conn = self._connect()
+        try:
+            deleted = 0
+            if older_than is not None:
+                deleted += conn.execute(
+                    f'DELETE FROM {self.table} WHERE stored_at < ?', (older_than,)
+                ).rowcount
+            if max_rows is not None:
+                deleted += conn.execute(
+                    f'DELETE FROM {self.table} WHERE key NOT IN '
+                    f'(SELECT key FROM {self.table} ORDER BY stored_at DESC LIMIT ?)', (max_rows,)
+                ).rowcount
+            conn.commit()
+            return deleted
+        finally:
+            conn.close()
+
+    def items(self, newer_than=None):
+        """Yield (key, value, stored_at) for every row, optionally only recent ones"""
+        conn = self._connect()
+        try:
+            query = f'SELECT key, value, stored_at FROM {self.table}'
+            params = ()
+            if newer_than is not None:
+                query += ' WHERE stored_at > ?'
+                params = (newer_than,)
+            for key, value, stored_at in conn.execute(query, params):
+                yield key, json.loads(value), stored_at
+        finally:
+            conn.close()
+
+    def __len__(self):
+        conn = self._connect()
+        count = conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+        conn.close()
+        return count
+
+
+class TieredCache:
+    """
+    Memory LRU in front of an optional SQLite store, with hit/miss counters.
+    Entries older than `ttl` seconds are stale; stale entries are still
+    served by lookup() for another `stale_ttl` seconds so callers can
+    refresh them in the background. The SQLite tier drops entries past the
+    stale window and keeps at most `disk_maxsize` rows (newest first).
+    """
+
+    def __init__(self, maxsize=1024, db_path=None, table='result_cache', ttl=None, stale_ttl=0,
+                 disk_maxsize=None):
+        self.memory = LRUCache(maxsize)
+        self.disk = SQLiteStore(db_path, table) if db_path else None
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.disk_maxsize = disk_maxsize
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'stale_hits': 0, 'misses': 0}
+        self._hit_age_total = 0.0
+        self._hit_age_max = 0.0
+
+    def _count(self, name, age=None):
+        with self._lock:
+            self._counters[name] += 1
+            if age is not None:
+                self._hit_age_total += age
+                self._hit_age_max = max(self._hit_age_max, age)
+
+    def _find(self, key):
+        """(value, stored_at, tier) from memory, then disk (promoting disk hits)"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry[0], entry[1], 'memory'
+
+        if self.disk is not None:
+            try:
+                entry = self.disk.get(key)
+            except sqlite3.Error as e:
+                print(f"Cache read error: {e}")
+                entry = None
+            if entry is not None:
+                self.memory.set(key, entry)
+                return entry[0], entry[1], 'disk'
+
+        return None, None, None
+
+    def lookup(self, key):
+        """
+        Return (value, age_seconds, fresh). Stale entries within the
+        stale window come back with fresh=False; misses are (None, None, False).
+        """
+        value, stored_at, tier = self._find(key)
+        if value is None:
+            self._count('misses')
+            return None, None, False
+
+        age = max(0.0, time.time() - stored_at)
+        if self.ttl is None or age <= self.ttl:
+            self._count(f'{tier}_hits', age)
+            return value, age, True
+        if age <= self.ttl + self.stale_ttl:
+            self._count('stale_hits', age)
+            return value, age, False
+
+        self._count('misses')
+        return None, None, False
+
+    def get(self, key):
+        """Return a fresh cached value or None"""
+        value, _, fresh = self.lookup(key)
+        return value if fresh else None
+
+    def set(self, key, value, stored_at=None):
+        stored_at = stored_at or time.time()
+        self.memory.set(key, (value, stored_at))
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, stored_at)
+            except sqlite3.Error as e:
+                print(f"Cache write error: {e}")
+
+            with self._lock:
+                self._writes += 1
+                due = self._writes % PRUNE_EVERY == 0
+            if due:
+                self.prune()
+
+    def prune(self):
+        """Delete expired and excess rows from the SQLite tier; returns the count"""
+        if self.disk is None:
+            return 0
+
+        older_than = None
+        if self.ttl is not None:
+            older_than = time.time() - self.ttl - self.stale_ttl
+        try:
+            return self.disk.prune(older_than, self.disk_maxsize)
+        except sqlite3.Error as e:
+            print(f"Cache prune error: {e}")
+            return 0
+
+    def warm(self):
+        """Load unexpired entries from the SQLite tier into memory; returns the count"""
+        if self.disk is None:
+            return 0
+
+        self.prune()
+        newer_than = None
+        if self.ttl is not None:
+            newer_than = time.time() - self.ttl - self.stale_ttl
+
+        loaded = 0
+        try:
+            for key, value, stored_at in self.disk.items(newer_than):
+                if loaded >= self.memory.maxsize:
+                    break
+                self.memory.set(key, (value, stored_at))
+                loaded += 1
+        except sqlite3.Error as e:
+            print(f"Cache warm error: {e}")
+        return loaded
+
+    def stats(self):
+        """Hit/miss counters, entry ages and sizes"""
+        with self._lock:
+            stats = dict(self._counters)
+            age_total, age_max = self._hit_age_total, self._hit_age_max
+
+        stats['hits'] = stats['memory_hits'] + stats['disk_hits']
+        served = stats['hits'] + stats['stale_hits']
+        lookups = served + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['avg_hit_age'] = round(age_total / served, 1) if served else 0.0
+        stats['max_hit_age'] = round(age_max, 1)
+        stats['memory_size'] = len(self.memory)
+        stats['persistent'] = self.disk is not None
+        return stats
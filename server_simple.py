@@ -1,8 +1,19 @@
 """Simplified server without heavy dependencies"""
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Request, Response, render_template, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+import functools
+import io
+import json
 import os
-from datetime import datetime
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import style_catalog
+from http_encoding import COMPRESS_MIN_SIZE, EncodedBody, ResponseCompressor
 from shopping_api import ShoppingAPI
+from circuit_breaker import all_status
+from result_cache import TieredCache, sha256_stream
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,11 +23,37 @@ print("Starting StyleAI+ Simple Server...")
 
 # Initialize shopping API
 shopping_api = ShoppingAPI()
+SHOPPING_PLATFORMS = ('amazon', 'flipkart', 'myntra')
+
+# Bounded pool shared by all requests for the /recommend AI explanation, so
+# a slow Grok call can be abandoned at the deadline
+recommend_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('RECOMMEND_WORKERS', 16)),
+    thread_name_prefix='recommend'
+)
+
+# Skip the AI explanation when less of the latency budget than this is left
+MIN_EXPLANATION_WAIT = 0.5
+
+# Cache complete Grok recommendations per normalized profile (only profiles
+# built from the UI's values, see grok_api.is_known_profile); the SQLite
+# tier keeps them across restarts and is pruned of expired and excess rows
+recommendation_cache = TieredCache(
+    maxsize=int(os.getenv('RECOMMENDATION_CACHE_SIZE', 10000)),
+    db_path='data/recommendation_cache.db' if os.getenv('RECOMMENDATION_CACHE_PERSIST', 'true').lower() == 'true' else None,
+    table='recommendation_cache',
+    ttl=float(os.getenv('RECOMMENDATION_CACHE_TTL', 7 * 24 * 3600)),
+    stale_ttl=float(os.getenv('RECOMMENDATION_CACHE_STALE_TTL', 24 * 3600)),
+    disk_maxsize=int(os.getenv('RECOMMENDATION_CACHE_DISK_SIZE', 20000))
+)
+# Load precomputed recommendations (see prewarm.py) so live traffic rarely
+# waits on the LLM
+print(f"Loaded {recommendation_cache.warm()} cached recommendations")
 
 # Initialize Grok API if available
 try:
     from grok_api import GrokAPI
-    grok_api = GrokAPI()
+    grok_api = GrokAPI(cache=recommendation_cache)
     ai_provider = os.getenv('AI_PROVIDER', 'grok')
     print(f"AI Provider: {ai_provider}")
 except Exception as e:
@@ -24,18 +61,74 @@ except Exception as e:
     grok_api = None
     ai_provider = None
 
+# Pre-encoded /recommend fallback bodies. Without an AI explanation the
+# fallback depends only on the request and the catalog version, so it is
+# serialized (and gzipped) once and served with a strong ETag
+response_cache = TieredCache(
+    maxsize=int(os.getenv('RESPONSE_CACHE_SIZE', 4096)),
+    table='response_cache'
+)
+
+# Cache /analyze results by SHA-256 of the uploaded bytes
+analysis_cache = TieredCache(
+    maxsize=int(os.getenv('ANALYSIS_CACHE_SIZE', 1024)),
+    db_path='data/analysis_cache.db' if os.getenv('ANALYSIS_CACHE_PERSIST', 'false').lower() == 'true' else None,
+    table='analysis_cache'
+)
+
+class InMemoryRequest(Request):
+    """Request that keeps uploaded files in memory instead of spooling to disk"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # MAX_CONTENT_LENGTH bounds the body, so the buffer is bounded too
+        return io.BytesIO()
+
+class CatalogJSONProvider(DefaultJSONProvider):
+    """JSON provider that also serializes the frozen style_catalog entries"""
+    
+    @staticmethod
+    def default(o):
+        try:
+            return style_catalog.json_default(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
+
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'uploads'
-os.makedirs('uploads', exist_ok=True)
+app.request_class = InMemoryRequest
+app.json = CatalogJSONProvider(app)
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_SIZE', 16 * 1024 * 1024))
+# Decode large uploads at reduced resolution (0 = always full resolution)
+app.config['ANALYSIS_PIXEL_BUDGET'] = int(os.getenv('ANALYSIS_PIXEL_BUDGET', 160000))
+# Seconds /recommend waits for the AI explanation before using the template
+# (capped by what is left of RECOMMEND_LLM_BUDGET when that is set)
+app.config['RECOMMEND_DEADLINE'] = float(os.getenv('RECOMMEND_DEADLINE', 8))
+# Seconds /recommend waits for Grok before answering from the built-in tables
+# (the Grok call finishes in the background and is cached); 0 = wait for Grok
+app.config['RECOMMEND_LLM_BUDGET'] = float(os.getenv('RECOMMEND_LLM_BUDGET', 3))
+# Seconds browsers may reuse static files before revalidating them
+# (unset = revalidate every time, answered by 304 while unchanged)
+if os.getenv('STATIC_MAX_AGE'):
+    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = int(os.getenv('STATIC_MAX_AGE'))
+
+# Compress JSON, HTML, CSS and JS responses (brotli or gzip) and add ETags;
+# server-sent events and pre-encoded responses pass through
+app.after_request(ResponseCompressor(
+    static_folder=app.static_folder,
+    min_size=int(os.getenv('COMPRESS_MIN_SIZE', COMPRESS_MIN_SIZE))
+))
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({'error': 'Image is too large'}), 413
 
 @app.route('/')
 def index():
     print("Index page requested")
     return render_template('index.html')
 
-@app.route('/upload', methods=['POST'])
-def upload_image():
-    print("Upload endpoint called")
+@app.route('/analyze', methods=['POST'])
+def analyze_skin():
+    print("Analyze endpoint called")
     try:
         if 'image' not in request.files:
             return jsonify({'error': 'No image provided'}), 400
@@ -44,84 +137,29 @@ def upload_image():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{file.filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        # Identical uploads skip decoding entirely
+        pixel_budget = app.config['ANALYSIS_PIXEL_BUDGET']
+        cache_key = f"simple:{pixel_budget}:{sha256_stream(file.stream)}"
+        result = analysis_cache.get(cache_key)
         
-        return jsonify({'success': True, 'filepath': filepath, 'filename': filename})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/analyze', methods=['POST'])
-def analyze_skin():
-    print("Analyze endpoint called")
-    try:
-        data = request.json
-        filepath = data.get('filepath')
-        
-        print(f"Received filepath: {filepath}")
-        
-        if not filepath:
-            return jsonify({'error': 'No file path provided'}), 400
+        if result is None:
+            # Simple image-based analysis using PIL + NumPy, decoded straight
+            # from the in-memory upload (nothing is written to disk)
+            from PIL import Image, UnidentifiedImageError
+            from color_analysis import analyze_image
             
-        if not os.path.exists(filepath):
-            return jsonify({'error': f'File not found: {filepath}'}), 400
-        
-        # Simple image-based analysis using PIL
-        from PIL import Image
-        
-        # Open image
-        img = Image.open(filepath)
-        img = img.convert('RGB')
-        
-        # Get average color from center region (face area)
-        width, height = img.size
-        center_box = (
-            width // 4, height // 4,
-            3 * width // 4, 3 * height // 4
-        )
-        center_region = img.crop(center_box)
-        
-        # Calculate average RGB
-        pixels = list(center_region.getdata())
-        avg_r = sum(p[0] for p in pixels) // len(pixels)
-        avg_g = sum(p[1] for p in pixels) // len(pixels)
-        avg_b = sum(p[2] for p in pixels) // len(pixels)
-        
-        # Calculate brightness
-        brightness = (avg_r + avg_g + avg_b) / 3
-        
-        # Classify skin tone based on brightness
-        if brightness > 200:
-            skin_tone = 'Fair'
-        elif brightness > 160:
-            skin_tone = 'Medium'
-        elif brightness > 120:
-            skin_tone = 'Olive'
-        else:
-            skin_tone = 'Deep'
-        
-        # Detect undertone based on color ratios
-        red_ratio = avg_r / (avg_g + avg_b + 1)
-        blue_ratio = avg_b / (avg_r + avg_g + 1)
-        
-        if red_ratio > 0.55:
-            undertone = 'warm'
-        elif blue_ratio > 0.35:
-            undertone = 'cool'
+            try:
+                with Image.open(file.stream) as img:
+                    result = analyze_image(img, pixel_budget)
+            except UnidentifiedImageError:
+                return jsonify({'error': 'Could not read image'}), 400
+            
+            analysis_cache.set(cache_key, result)
         else:
-            undertone = 'neutral'
-        
-        # Convert to hex
-        hex_color = '#{:02x}{:02x}{:02x}'.format(avg_r, avg_g, avg_b)
+            print("Analysis cache hit")
         
-        # Delete image after analysis
-        try:
-            os.remove(filepath)
-            print(f"Deleted file: {filepath}")
-        except Exception as e:
-            print(f"Could not delete file: {e}")
+        skin_tone = result['skin_tone']
+        undertone = result['undertone']
         
         print(f"Analysis result: {skin_tone} skin with {undertone} undertone")
         
@@ -129,8 +167,8 @@ def analyze_skin():
             'success': True,
             'skin_tone': skin_tone,
             'undertone': undertone,
-            'rgb': [avg_r, avg_g, avg_b],
-            'hex': hex_color
+            'rgb': result['rgb'],
+            'hex': result['hex']
         })
         
     except Exception as e:
@@ -139,11 +177,212 @@ def analyze_skin():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+# Worker pool for /analyze/batch, started on first use
+batch_analyzer = None
+batch_analyzer_lock = threading.Lock()
+
+def get_batch_analyzer():
+    global batch_analyzer
+    with batch_analyzer_lock:
+        if batch_analyzer is None:
+            from batch_analyzer import BatchAnalyzer
+            workers = int(os.getenv('BATCH_WORKERS', 0)) or None
+            batch_analyzer = BatchAnalyzer(workers, app.config['ANALYSIS_PIXEL_BUDGET'])
+        return batch_analyzer
+
+def resolve_batch_path(path):
+    """Map a client path into BATCH_IMAGE_ROOT, rejecting anything outside it"""
+    root = os.path.realpath(os.getenv('BATCH_IMAGE_ROOT', ''))
+    full_path = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full_path]) != root:
+        raise ValueError(f'Path outside BATCH_IMAGE_ROOT: {path}')
+    return full_path
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Face-based skin analysis of many images on a process pool.
+    Accepts multipart 'images' files, or JSON {"paths": [...]} relative to
+    BATCH_IMAGE_ROOT. Streams one JSON line per image, in input order.
+    """
+    print("Batch analyze endpoint called")
+    try:
+        if request.files:
+            files = request.files.getlist('images')
+            names = [f.filename for f in files]
+            images = [f.read() for f in files]
+        else:
+            data = request.get_json(silent=True)
+            names = data.get('paths') if isinstance(data, dict) else None
+            if not isinstance(names, list) or not all(isinstance(path, str) for path in names):
+                return jsonify({'error': 'Send multipart "images" files or JSON {"paths": [...]} '
+                                         'with a list of path strings'}), 400
+            if not os.getenv('BATCH_IMAGE_ROOT'):
+                return jsonify({'error': 'BATCH_IMAGE_ROOT is not configured'}), 400
+            images = [resolve_batch_path(path) for path in names]
+        
+        if not images:
+            return jsonify({'error': 'No images provided'}), 400
+        
+        results = get_batch_analyzer().analyze_batch(images)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Batch analysis error: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        for index, (name, result) in enumerate(zip(names, results)):
+            yield json.dumps({'index': index, 'name': name, **result}) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+# Face analyzer for group photos, created on first use
+group_analyzer = None
+group_analyzer_lock = threading.Lock()
+
+def get_group_analyzer():
+    global group_analyzer
+    with group_analyzer_lock:
+        if group_analyzer is None:
+            from skin_analyzer import SkinAnalyzer
+            group_analyzer = SkinAnalyzer(
+                pixel_budget=app.config['ANALYSIS_PIXEL_BUDGET'] * 4,
+                detect_max_side=int(os.getenv('GROUP_DETECT_MAX_SIDE', 1280)),
+                min_face_size=int(os.getenv('GROUP_MIN_FACE_SIZE', 32))
+            )
+        return group_analyzer
+
+@app.route('/analyze/group', methods=['POST'])
+def analyze_group():
+    """Per-face skin tone, undertone and hex for every face in a group photo"""
+    print("Group analyze endpoint called")
+    if 'image' not in request.files:
+        return jsonify({'error': 'No image provided'}), 400
+    
+    try:
+        result = get_group_analyzer().analyze_faces(request.files['image'].stream)
+        return jsonify(result), 200 if result.get('success') else 400
+    except Exception as e:
+        print(f"Group analysis error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/analyze/video', methods=['POST'])
+def analyze_video_clip():
+    """Analyze a short uploaded clip, stopping once the classification is stable"""
+    print("Video analyze endpoint called")
+    if 'video' not in request.files:
+        return jsonify({'error': 'No video provided'}), 400
+    
+    # OpenCV can only demux from a path, so the clip lives in a temporary
+    # file that is always removed, even if analysis fails
+    file = request.files['video']
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(file.filename or '')[1])
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            file.save(f)
+        
+        from stream_analyzer import analyze_video
+        result = analyze_video(path, max_frames=int(os.getenv('VIDEO_MAX_FRAMES', 300)))
+        status = 200 if result.get('success') else 400
+        return jsonify(result), status
+    except Exception as e:
+        print(f"Video analysis error: {e}")
+        return jsonify({'error': str(e)}), 500
+    finally:
+        os.remove(path)
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'analysis': analysis_cache.stats(),
+        'recommendations': recommendation_cache.stats(),
+        'responses': response_cache.stats(),
+        'coalescing': grok_api.inflight.stats() if grok_api else None,
+        'grok_http': grok_api.http.stats() if grok_api else None
+    })
+
+@app.route('/health/providers', methods=['GET'])
+def provider_health():
+    """Circuit breaker state, rolling error rate and latency per AI provider"""
+    return jsonify({
+        'ai_provider': ai_provider,
+        'providers': all_status()
+    })
+
+def search_shopping(occasion, budget, skin_tone, gender, color_palette):
+    """{platform: products} for every shopping platform, built in one pass"""
+    return shopping_api.search_all_platforms(
+        occasion=occasion,
+        budget=budget,
+        limit=4,
+        platforms=SHOPPING_PLATFORMS,
+        skin_tone=skin_tone,
+        gender=gender,
+        color_palette=color_palette
+    )
+
+def run_concurrently(calls, timeout):
+    """
+    Run {name: callable} on the shared recommendation executor and wait at
+    most `timeout` seconds. Returns {name: result}; calls that raised or
+    missed the deadline are left out.
+    """
+    futures = {recommend_executor.submit(fn): name for name, fn in calls.items()}
+    done, pending = wait(futures, timeout=timeout)
+    
+    results = {}
+    for future in done:
+        try:
+            results[futures[future]] = future.result()
+        except Exception as e:
+            print(f"{futures[future]} failed: {e}")
+    for future in pending:
+        future.cancel()
+        print(f"{futures[future]} missed the {timeout}s deadline")
+    return results
+
+def builtin_recommendations(skin_tone, undertone, occasion, vibe, catalog=None):
+    """Palette, outfits, accessories, hairstyles and explanation from the style catalog"""
+    entry = (catalog or style_catalog.current()).lookup(skin_tone, undertone, occasion)
+    color_palette = entry['color_palette']
+    return {
+        **entry,
+        'explanation': f'These {", ".join([c["name"] for c in color_palette[:3]])} colors are specially chosen for your {skin_tone.lower()} skin tone with {undertone} undertones. Perfect for {occasion} occasions with a {vibe} vibe!'
+    }
+
+# Profile fields of /recommend and /recommend/stream with their defaults
+PROFILE_DEFAULTS = {
+    'occasion': 'daily',
+    'budget': 'medium',
+    'skin_tone': 'Medium',
+    'undertone': 'warm',
+    'vibe': 'casual',
+    'gender': 'female'
+}
+
+def profile_fields(data):
+    """
+    The profile fields of a recommendation request as strings (numbers are
+    accepted and converted). Raises ValueError for a body that is not a
+    JSON object or a field that is a list, object, boolean or null.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+    
+    fields = {}
+    for name, default in PROFILE_DEFAULTS.items():
+        value = data.get(name, default)
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError(f"'{name}' must be a string")
+        fields[name] = str(value)
+    return fields
+
 @app.route('/recommend', methods=['POST'])
 def get_recommendations():
     print("Recommend endpoint called")
     try:
-        data = request.json
+        data = profile_fields(request.get_json(silent=True))
         occasion = data.get('occasion', 'daily')
         budget = data.get('budget', 'medium')
         skin_tone = data.get('skin_tone', 'Medium')
@@ -156,7 +395,9 @@ def get_recommendations():
         print(f"Error parsing request: {e}")
         return jsonify({'error': 'Invalid request data', 'details': str(e)}), 400
     
-    # Try to get Grok-powered recommendations first
+    # Try to get Grok-powered recommendations first, within the latency budget
+    started = time.monotonic()
+    llm_pending = False
     if grok_api and ai_provider == 'grok':
         try:
             print("Generating recommendations using Grok API...")
@@ -166,7 +407,8 @@ def get_recommendations():
                 gender=gender,
                 occasion=occasion,
                 vibe=vibe,
-                budget=budget
+                budget=budget,
+                max_wait=app.config['RECOMMEND_LLM_BUDGET'] or None
             )
             
             if grok_result.get('success'):
@@ -179,73 +421,28 @@ def get_recommendations():
                 
                 print("✓ Grok recommendations generated successfully")
                 
-                # Get shopping products with color palette and gender
                 try:
-                    amazon_products = shopping_api.search_products(
-                        query='fashion',
-                        occasion=occasion,
-                        budget=budget,
-                        limit=4,
-                        platform='amazon',
-                        skin_tone=skin_tone,
-                        gender=gender,
-                        color_palette=color_palette
-                    )
-                    
-                    flipkart_products = shopping_api.search_products(
-                        query='fashion',
-                        occasion=occasion,
-                        budget=budget,
-                        limit=4,
-                        platform='flipkart',
-                        skin_tone=skin_tone,
-                        gender=gender,
-                        color_palette=color_palette
-                    )
-                    
-                    myntra_products = shopping_api.search_products(
-                        query='fashion',
-                        occasion=occasion,
-                        budget=budget,
-                        limit=4,
-                        platform='myntra',
-                        skin_tone=skin_tone,
-                        gender=gender,
-                        color_palette=color_palette
-                    )
-                    
-                    print(f"Shopping products fetched successfully")
-                    
-                    return jsonify({
-                        'success': True,
-                        'color_palette': color_palette,
-                        'outfits': outfits,
-                        'accessories': accessories,
-                        'hairstyle': hairstyles,
-                        'shopping': {
-                            'amazon': amazon_products,
-                            'flipkart': flipkart_products,
-                            'myntra': myntra_products
-                        },
-                        'explanation': explanation,
-                        'ai_powered': True,
-                        'source': 'grok'
-                    })
-                    
+                    shopping = search_shopping(occasion, budget, skin_tone, gender, color_palette)
                 except Exception as e:
                     print(f"Shopping API error: {e}")
                     # Return Grok recommendations without shopping
-                    return jsonify({
-                        'success': True,
-                        'color_palette': color_palette,
-                        'outfits': outfits,
-                        'accessories': accessories,
-                        'hairstyle': hairstyles,
-                        'shopping': {'amazon': [], 'flipkart': [], 'myntra': []},
-                        'explanation': explanation,
-                        'ai_powered': True,
-                        'source': 'grok'
-                    })
+                    shopping = {platform: [] for platform in SHOPPING_PLATFORMS}
+                
+                return jsonify({
+                    'success': True,
+                    'color_palette': color_palette,
+                    'outfits': outfits,
+                    'accessories': accessories,
+                    'hairstyle': hairstyles,
+                    'shopping': shopping,
+                    'explanation': explanation,
+                    'ai_powered': True,
+                    'source': 'grok'
+                })
+            elif grok_result.get('pending'):
+                # Grok is still working; it will cache the answer for next time
+                llm_pending = True
+                print(f"Grok missed the latency budget: {grok_result.get('error')}")
             else:
                 print(f"Grok API failed: {grok_result.get('error')}")
                 # Fall through to default recommendations
@@ -259,330 +456,69 @@ def get_recommendations():
     # Fallback: Use built-in recommendations if Grok is not available
     print("Using built-in recommendations (Grok not available)")
     
-        vibe = data.get('vibe', 'casual')
-        
-        print(f"Request data: skin_tone={skin_tone}, undertone={undertone}, occasion={occasion}, budget={budget}")
-    except Exception as e:
-        print(f"Error parsing request: {e}")
-        return jsonify({'error': 'Invalid request data', 'details': str(e)}), 400
+    # Without the AI explanation the body is fully determined by the request
+    # and the catalog, so it can come from the pre-encoded response cache
+    ai_explanation = grok_api is not None and ai_provider == 'grok' and not llm_pending
+    catalog = style_catalog.current()
     
-    # Personalized color palettes based on skin tone and undertone
-    color_palettes = {
-        'Fair_warm': [
-            {'name': 'Peach', 'hex': '#FFDAB9'},
-            {'name': 'Coral', 'hex': '#FF7F50'},
-            {'name': 'Warm Brown', 'hex': '#8B4513'},
-            {'name': 'Golden Yellow', 'hex': '#FFD700'},
-            {'name': 'Rust Orange', 'hex': '#B7410E'}
-        ],
-        'Fair_cool': [
-            {'name': 'Baby Pink', 'hex': '#F4C2C2'},
-            {'name': 'Lavender', 'hex': '#E6E6FA'},
-            {'name': 'Navy Blue', 'hex': '#000080'},
-            {'name': 'Emerald Green', 'hex': '#50C878'},
-            {'name': 'Royal Purple', 'hex': '#7851A9'}
-        ],
-        'Fair_neutral': [
-            {'name': 'Soft Pink', 'hex': '#FFB6C1'},
-            {'name': 'Sky Blue', 'hex': '#87CEEB'},
-            {'name': 'Mint Green', 'hex': '#98FF98'},
-            {'name': 'Lemon Yellow', 'hex': '#FFF44F'},
-            {'name': 'Lilac', 'hex': '#C8A2C8'}
-        ],
-        'Medium_warm': [
-            {'name': 'Terracotta', 'hex': '#E2725B'},
-            {'name': 'Olive Green', 'hex': '#808000'},
-            {'name': 'Burnt Orange', 'hex': '#CC5500'},
-            {'name': 'Mustard Yellow', 'hex': '#FFDB58'},
-            {'name': 'Warm Red', 'hex': '#DC143C'}
-        ],
-        'Medium_cool': [
-            {'name': 'Teal', 'hex': '#008080'},
-            {'name': 'Magenta', 'hex': '#FF00FF'},
-            {'name': 'Cool Pink', 'hex': '#FF69B4'},
-            {'name': 'Turquoise', 'hex': '#40E0D0'},
-            {'name': 'Plum', 'hex': '#8E4585'}
-        ],
-        'Medium_neutral': [
-            {'name': 'Rose Gold', 'hex': '#B76E79'},
-            {'name': 'Sage Green', 'hex': '#9DC183'},
-            {'name': 'Dusty Rose', 'hex': '#DCAE96'},
-            {'name': 'Soft Coral', 'hex': '#F88379'},
-            {'name': 'Periwinkle', 'hex': '#CCCCFF'}
-        ],
-        'Olive_warm': [
-            {'name': 'Army Green', 'hex': '#4B5320'},
-            {'name': 'Bronze', 'hex': '#CD7F32'},
-            {'name': 'Camel', 'hex': '#C19A6B'},
-            {'name': 'Burnt Sienna', 'hex': '#E97451'},
-            {'name': 'Warm Beige', 'hex': '#D2B48C'}
-        ],
-        'Olive_cool': [
-            {'name': 'Forest Green', 'hex': '#228B22'},
-            {'name': 'Deep Purple', 'hex': '#673AB7'},
-            {'name': 'Burgundy', 'hex': '#800020'},
-            {'name': 'Slate Blue', 'hex': '#6A5ACD'},
-            {'name': 'Charcoal', 'hex': '#36454F'}
-        ],
-        'Olive_neutral': [
-            {'name': 'Khaki', 'hex': '#C3B091'},
-            {'name': 'Moss Green', 'hex': '#8A9A5B'},
-            {'name': 'Taupe', 'hex': '#483C32'},
-            {'name': 'Mauve', 'hex': '#E0B0FF'},
-            {'name': 'Steel Blue', 'hex': '#4682B4'}
-        ],
-        'Deep_warm': [
-            {'name': 'Rich Gold', 'hex': '#FFD700'},
-            {'name': 'Bright Orange', 'hex': '#FF8C00'},
-            {'name': 'Crimson', 'hex': '#DC143C'},
-            {'name': 'Amber', 'hex': '#FFBF00'},
-            {'name': 'Copper', 'hex': '#B87333'}
-        ],
-        'Deep_cool': [
-            {'name': 'Electric Blue', 'hex': '#7DF9FF'},
-            {'name': 'Hot Pink', 'hex': '#FF69B4'},
-            {'name': 'Violet', 'hex': '#8F00FF'},
-            {'name': 'Cyan', 'hex': '#00FFFF'},
-            {'name': 'Fuchsia', 'hex': '#FF00FF'}
-        ],
-        'Deep_neutral': [
-            {'name': 'Ruby Red', 'hex': '#E0115F'},
-            {'name': 'Sapphire Blue', 'hex': '#0F52BA'},
-            {'name': 'Emerald', 'hex': '#50C878'},
-            {'name': 'Amethyst', 'hex': '#9966CC'},
-            {'name': 'Topaz', 'hex': '#FFC87C'}
-        ]
-    }
-    
-    # Get personalized color palette
-    palette_key = f"{skin_tone}_{undertone}"
-    color_palette = color_palettes.get(palette_key, color_palettes['Medium_neutral'])
-    
-    # Personalized accessories based on occasion and undertone
-    accessories_by_occasion = {
-        'wedding': {
-            'warm': ['Gold Jhumkas', 'Kundan Necklace', 'Gold Bangles', 'Maang Tikka', 'Embroidered Clutch'],
-            'cool': ['Silver Chandbalis', 'Diamond Necklace', 'Silver Bangles', 'Pearl Maang Tikka', 'Sequin Clutch'],
-            'neutral': ['Rose Gold Earrings', 'Polki Necklace', 'Mixed Metal Bangles', 'Crystal Maang Tikka', 'Beaded Clutch']
-        },
-        'party': {
-            'warm': ['Gold Hoops', 'Layered Gold Chain', 'Metallic Clutch', 'Gold Watch', 'Amber Ring'],
-            'cool': ['Silver Studs', 'Platinum Chain', 'Sequin Bag', 'Silver Watch', 'Sapphire Ring'],
-            'neutral': ['Rose Gold Danglers', 'Delicate Necklace', 'Satin Clutch', 'Minimalist Watch', 'Pearl Ring']
-        },
-        'work': {
-            'warm': ['Small Gold Studs', 'Thin Gold Chain', 'Leather Tote', 'Classic Watch', 'Simple Ring'],
-            'cool': ['Silver Studs', 'Silver Pendant', 'Black Tote', 'Steel Watch', 'Minimal Ring'],
-            'neutral': ['Pearl Studs', 'Delicate Chain', 'Beige Tote', 'Leather Watch', 'Stackable Rings']
-        },
-        'gym': {
-            'warm': ['Sports Watch', 'Gym Bag', 'Sweatband', 'Fitness Tracker', 'Water Bottle'],
-            'cool': ['Fitness Watch', 'Duffle Bag', 'Headband', 'Activity Tracker', 'Insulated Bottle'],
-            'neutral': ['Smart Watch', 'Backpack', 'Hair Ties', 'Step Counter', 'Shaker Bottle']
-        },
-        'beach': {
-            'warm': ['Gold Anklet', 'Straw Hat', 'Woven Beach Bag', 'Tortoise Sunglasses', 'Shell Bracelet'],
-            'cool': ['Silver Anklet', 'White Sun Hat', 'Canvas Tote', 'Blue Sunglasses', 'Turquoise Bracelet'],
-            'neutral': ['Beaded Anklet', 'Floppy Hat', 'Mesh Beach Bag', 'Mirrored Sunglasses', 'Leather Bracelet']
-        },
-        'date': {
-            'warm': ['Dainty Gold Necklace', 'Small Hoops', 'Crossbody Bag', 'Delicate Bracelet', 'Nude Heels'],
-            'cool': ['Silver Pendant', 'Pearl Studs', 'Mini Bag', 'Silver Bracelet', 'Strappy Heels'],
-            'neutral': ['Layered Necklace', 'Drop Earrings', 'Clutch Bag', 'Charm Bracelet', 'Block Heels']
-        },
-        'festival': {
-            'warm': ['Oxidized Jhumkas', 'Coin Necklace', 'Potli Bag', 'Colorful Bangles', 'Embroidered Juttis'],
-            'cool': ['Silver Chandbalis', 'Temple Jewelry', 'Mirror Work Bag', 'Silver Bangles', 'Mojaris'],
-            'neutral': ['Tribal Earrings', 'Beaded Necklace', 'Ethnic Clutch', 'Thread Bangles', 'Kolhapuri Chappals']
-        }
-    }
-    
-    # Personalized hairstyles based on occasion and face shape (inferred from skin tone)
-    hairstyles_by_occasion = {
-        'wedding': {
-            'Fair': ['Elegant Low Bun with Flowers', 'Side-swept Curls with Maang Tikka'],
-            'Medium': ['Braided Crown with Gajra', 'Soft Waves with Hair Accessories'],
-            'Olive': ['Sleek High Bun with Jewelry', 'Half-up Half-down with Curls'],
-            'Deep': ['Voluminous Curls with Side Part', 'Twisted Updo with Statement Pins']
-        },
-        'party': {
-            'Fair': ['Beachy Waves', 'High Ponytail with Volume'],
-            'Medium': ['Sleek Straight Hair', 'Messy Bun with Face-framing Layers'],
-            'Olive': ['Bouncy Curls', 'Side-swept Waves'],
-            'Deep': ['Defined Curls', 'Slicked Back Bun']
-        },
-        'work': {
-            'Fair': ['Low Ponytail', 'Simple Straight Blowout'],
-            'Medium': ['Professional Low Bun', 'Neat Middle Part'],
-            'Olive': ['Sleek Ponytail', 'Tucked Behind Ears'],
-            'Deep': ['Polished Bun', 'Natural Texture with Headband']
-        },
-        'gym': {
-            'Fair': ['High Ponytail', 'Dutch Braids'],
-            'Medium': ['Top Knot', 'Braided Ponytail'],
-            'Olive': ['Sleek Bun', 'Double French Braids'],
-            'Deep': ['Puff with Ponytail', 'Cornrows']
-        },
-        'beach': {
-            'Fair': ['Loose Beach Waves', 'Messy Braid'],
-            'Medium': ['Natural Texture', 'Low Pigtails'],
-            'Olive': ['Wet Look Slick Back', 'Fishtail Braid'],
-            'Deep': ['Protective Style with Scarf', 'Box Braids']
-        },
-        'date': {
-            'Fair': ['Soft Romantic Curls', 'Half-up with Loose Waves'],
-            'Medium': ['Voluminous Blowout', 'Low Side Braid'],
-            'Olive': ['Sleek and Straight', 'Textured Ponytail'],
-            'Deep': ['Defined Curls with Side Part', 'Elegant Low Ponytail']
-        }
-    }
-    
-    # Get personalized accessories and hairstyles
-    accessories = accessories_by_occasion.get(occasion, {}).get(undertone, 
-        ['Statement Earrings', 'Crossbody Bag', 'Sunglasses', 'Watch', 'Scarf'])
-    
-    hairstyles = hairstyles_by_occasion.get(occasion, {}).get(skin_tone,
-        ['Soft Waves', 'Low Bun'])
-    
-    # Personalized outfits based on skin tone and undertone
-    outfit_recommendations = {
-        'Fair_warm': [
-            {'name': 'Peachy Elegance', 'items': ['Peach Blouse', 'Beige Trousers', 'Gold Accessories'], 'colors': ['#FFDAB9', '#F5DEB3', '#FFD700']},
-            {'name': 'Coral Chic', 'items': ['Coral Dress', 'Nude Heels', 'Gold Jewelry'], 'colors': ['#FF7F50', '#F5DEB3', '#FFD700']},
-        ],
-        'Fair_cool': [
-            {'name': 'Lavender Dream', 'items': ['Lavender Top', 'White Pants', 'Silver Jewelry'], 'colors': ['#E6E6FA', '#FFFFFF', '#C0C0C0']},
-            {'name': 'Navy Sophistication', 'items': ['Navy Blazer', 'Pink Shirt', 'Silver Accessories'], 'colors': ['#000080', '#FFB6C1', '#C0C0C0']},
-        ],
-        'Fair_neutral': [
-            {'name': 'Soft Pink Charm', 'items': ['Pink Dress', 'Beige Cardigan', 'Rose Gold Jewelry'], 'colors': ['#FFB6C1', '#F5DEB3', '#B76E79']},
-            {'name': 'Sky Blue Fresh', 'items': ['Sky Blue Top', 'White Skirt', 'Silver Accessories'], 'colors': ['#87CEEB', '#FFFFFF', '#C0C0C0']},
-        ],
-        'Medium_warm': [
-            {'name': 'Terracotta Sunset', 'items': ['Terracotta Dress', 'Brown Belt', 'Gold Jewelry'], 'colors': ['#E2725B', '#8B4513', '#FFD700']},
-            {'name': 'Olive Elegance', 'items': ['Olive Green Top', 'Mustard Pants', 'Bronze Accessories'], 'colors': ['#808000', '#FFDB58', '#CD7F32']},
-        ],
-        'Medium_cool': [
-            {'name': 'Teal Sophistication', 'items': ['Teal Dress', 'Silver Heels', 'Cool Pink Scarf'], 'colors': ['#008080', '#C0C0C0', '#FF69B4']},
-            {'name': 'Magenta Magic', 'items': ['Magenta Top', 'Black Pants', 'Silver Jewelry'], 'colors': ['#FF00FF', '#000000', '#C0C0C0']},
-        ],
-        'Medium_neutral': [
-            {'name': 'Rose Gold Glow', 'items': ['Rose Gold Dress', 'Nude Heels', 'Delicate Jewelry'], 'colors': ['#B76E79', '#F5DEB3', '#FFD700']},
-            {'name': 'Sage Serenity', 'items': ['Sage Green Top', 'Beige Pants', 'Gold Accessories'], 'colors': ['#9DC183', '#F5DEB3', '#FFD700']},
-        ],
-        'Olive_warm': [
-            {'name': 'Army Chic', 'items': ['Army Green Jacket', 'Camel Pants', 'Bronze Jewelry'], 'colors': ['#4B5320', '#C19A6B', '#CD7F32']},
-            {'name': 'Bronze Beauty', 'items': ['Bronze Dress', 'Brown Accessories', 'Gold Jewelry'], 'colors': ['#CD7F32', '#8B4513', '#FFD700']},
-        ],
-        'Olive_cool': [
-            {'name': 'Forest Mystique', 'items': ['Forest Green Dress', 'Black Heels', 'Silver Jewelry'], 'colors': ['#228B22', '#000000', '#C0C0C0']},
-            {'name': 'Burgundy Elegance', 'items': ['Burgundy Top', 'Black Pants', 'Gold Accessories'], 'colors': ['#800020', '#000000', '#FFD700']},
-        ],
-        'Olive_neutral': [
-            {'name': 'Khaki Comfort', 'items': ['Khaki Dress', 'Brown Belt', 'Gold Jewelry'], 'colors': ['#C3B091', '#8B4513', '#FFD700']},
-            {'name': 'Moss Green Fresh', 'items': ['Moss Green Top', 'Beige Pants', 'Bronze Accessories'], 'colors': ['#8A9A5B', '#F5DEB3', '#CD7F32']},
-        ],
-        'Deep_warm': [
-            {'name': 'Golden Goddess', 'items': ['Gold Dress', 'Copper Accessories', 'Amber Jewelry'], 'colors': ['#FFD700', '#B87333', '#FFBF00']},
-            {'name': 'Crimson Queen', 'items': ['Crimson Dress', 'Gold Heels', 'Bright Accessories'], 'colors': ['#DC143C', '#FFD700', '#FF8C00']},
-        ],
-        'Deep_cool': [
-            {'name': 'Electric Diva', 'items': ['Electric Blue Dress', 'Silver Heels', 'Bold Jewelry'], 'colors': ['#7DF9FF', '#C0C0C0', '#FF69B4']},
-            {'name': 'Violet Royalty', 'items': ['Violet Gown', 'Silver Accessories', 'Statement Jewelry'], 'colors': ['#8F00FF', '#C0C0C0', '#FF00FF']},
-        ],
-        'Deep_neutral': [
-            {'name': 'Ruby Radiance', 'items': ['Ruby Red Dress', 'Gold Jewelry', 'Black Heels'], 'colors': ['#E0115F', '#FFD700', '#000000']},
-            {'name': 'Emerald Elegance', 'items': ['Emerald Dress', 'Gold Accessories', 'Nude Heels'], 'colors': ['#50C878', '#FFD700', '#F5DEB3']},
-        ]
-    }
-    
-    # Get personalized outfits or use default fallback
-    palette_key = f"{skin_tone}_{undertone}"
-    outfits = outfit_recommendations.get(palette_key, [
-        {'name': 'Casual Look', 'items': ['Floral Top', 'Denim Jeans', 'White Sneakers'], 'colors': ['#FF6B6B', '#4D96FF', '#FFFFFF']},
-        {'name': 'Everyday Chic', 'items': ['T-shirt', 'Palazzo', 'Flats'], 'colors': ['#FFD93D', '#2C3E50', '#8B4513']},
-    ])
-    
-    # Get shopping products with skin-tone specific keywords
-    search_modifier = ''
-    if skin_tone == 'Fair':
-        search_modifier = 'light pastel'
-    elif skin_tone == 'Medium':
-        search_modifier = 'vibrant colorful'
-    elif skin_tone == 'Olive':
-        search_modifier = 'earthy warm'
-    elif skin_tone == 'Deep':
-        search_modifier = 'bold bright'
-    
-    # Get shopping products for each platform separately with skin-tone specific searches
+    # The shopping search is local and fast; only the AI explanation goes to
+    # the shared executor, and the template explanation is used if Grok
+    # misses the deadline
     try:
-        amazon_products = shopping_api.search_products(
-            query='fashion',
-            occasion=occasion,
-            budget=budget,
-            limit=4,
-            platform='amazon',
-            skin_tone=skin_tone,
-            gender=gender,
-            color_palette=color_palette
-        )
-        
-        flipkart_products = shopping_api.search_products(
-            query='fashion',
-            occasion=occasion,
-            budget=budget,
-            limit=4,
-            platform='flipkart',
-            skin_tone=skin_tone,
-            gender=gender,
-            color_palette=color_palette
-        )
+        cache_key = None
+        if not ai_explanation:
+            cache_key = (catalog.version, skin_tone, undertone, occasion, vibe, gender, budget, llm_pending)
+            encoded = response_cache.get(cache_key)
+            if encoded is not None:
+                return encoded.respond(request)
         
-        myntra_products = shopping_api.search_products(
-            query='fashion',
-            occasion=occasion,
-            budget=budget,
-            limit=4,
-            platform='myntra',
-            skin_tone=skin_tone,
-            gender=gender,
-            color_palette=color_palette
-        )
+        local = builtin_recommendations(skin_tone, undertone, occasion, vibe, catalog)
+        color_palette = local['color_palette']
         
-        print(f"Shopping products fetched successfully")
+        shopping = search_shopping(occasion, budget, skin_tone, gender, color_palette)
         
-        # Generate AI-powered explanation if Grok is available
-        explanation = f'These {", ".join([c["name"] for c in color_palette[:3]])} colors are specially chosen for your {skin_tone.lower()} skin tone with {undertone} undertones. Perfect for {occasion} occasions with a {vibe} vibe!'
+        # The explanation only gets what is left of the latency budget, so a
+        # Grok failure inside the budget cannot add a full deadline on top
+        explanation_wait = app.config['RECOMMEND_DEADLINE']
+        if app.config['RECOMMEND_LLM_BUDGET']:
+            explanation_wait = min(explanation_wait,
+                                   app.config['RECOMMEND_LLM_BUDGET'] - (time.monotonic() - started))
         
-        if grok_api and ai_provider == 'grok':
-            try:
-                ai_explanation = grok_api.get_personalized_explanation(
+        explanation = None
+        # Skip the AI explanation when Grok has just missed the budget or
+        # too little of it is left
+        if ai_explanation and explanation_wait >= MIN_EXPLANATION_WAIT:
+            explanation = run_concurrently({
+                'explanation': functools.partial(
+                    grok_api.get_personalized_explanation,
                     skin_tone=skin_tone,
                     undertone=undertone,
                     colors=color_palette,
                     occasion=occasion
                 )
-                if ai_explanation:
-                    explanation = ai_explanation
-                    print("Using Grok-generated explanation")
-            except Exception as e:
-                print(f"Grok explanation error: {e}")
+            }, explanation_wait).get('explanation')
         
-        return jsonify({
+        if explanation:
+            print("Using Grok-generated explanation")
+        else:
+            explanation = local['explanation']
+        
+        payload = {
             'success': True,
-            'color_palette': color_palette,
-            'outfits': outfits,
-            'accessories': accessories,
-            'hairstyle': hairstyles,
-            'shopping': {
-                'amazon': amazon_products,
-                'flipkart': flipkart_products,
-                'myntra': myntra_products
-            },
+            **local,
+            'shopping': shopping,
             'explanation': explanation,
             'ai_powered': grok_api is not None and ai_provider == 'grok',
+            'ai_pending': llm_pending,
             'source': 'fallback'
-        })
+        }
+        response = jsonify(payload)
+        if cache_key is None:
+            return response
+        
+        encoded = EncodedBody(response.get_data(), response.mimetype)
+        response_cache.set(cache_key, encoded)
+        return encoded.respond(request)
     
     except Exception as e:
         print(f"Error in recommendation generation: {e}")
@@ -590,6 +526,67 @@ def get_recommendations():
         traceback.print_exc()
         return jsonify({'error': 'Failed to generate recommendations', 'details': str(e)}), 500
 
+def sse_event(event, data):
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=app.json.default)}\n\n"
+
+@app.route('/recommend/stream', methods=['POST'])
+def stream_recommendations():
+    """
+    Server-sent events variant of /recommend. Sends the built-in
+    recommendations and shopping links at once ('local'), then each AI
+    section as Grok streams it ('section', plus 'shopping' for the AI
+    palette), and finally 'done' (or 'error' followed by 'done').
+    """
+    print("Recommend stream endpoint called")
+    try:
+        data = profile_fields(request.get_json(silent=True))
+        occasion = data.get('occasion', 'daily')
+        budget = data.get('budget', 'medium')
+        skin_tone = data.get('skin_tone', 'Medium')
+        undertone = data.get('undertone', 'warm')
+        vibe = data.get('vibe', 'casual')
+        gender = data.get('gender', 'female')
+    except Exception as e:
+        print(f"Error parsing request: {e}")
+        return jsonify({'error': 'Invalid request data', 'details': str(e)}), 400
+    
+    def shopping_for(color_palette):
+        return search_shopping(occasion, budget, skin_tone, gender, color_palette)
+    
+    def generate():
+        local = builtin_recommendations(skin_tone, undertone, occasion, vibe)
+        yield sse_event('local', {**local, 'shopping': shopping_for(local['color_palette'])})
+        
+        if not (grok_api and ai_provider == 'grok'):
+            yield sse_event('done', {'source': 'fallback'})
+            return
+        
+        try:
+            for section, value in grok_api.stream_complete_recommendations(
+                skin_tone=skin_tone,
+                undertone=undertone,
+                gender=gender,
+                occasion=occasion,
+                vibe=vibe,
+                budget=budget
+            ):
+                # The page calls the hairstyles list 'hairstyle'
+                name = 'hairstyle' if section == 'hairstyles' else section
+                yield sse_event('section', {'name': name, 'value': value})
+                if section == 'color_palette' and value:
+                    yield sse_event('shopping', shopping_for(value))
+            yield sse_event('done', {'source': 'grok'})
+        except Exception as e:
+            print(f"Grok stream error: {e}")
+            yield sse_event('error', {'error': str(e)})
+            yield sse_event('done', {'source': 'fallback'})
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/feedback', methods=['POST'])
 def submit_feedback():
     print("Feedback endpoint called")
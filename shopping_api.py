@@ -1,7 +1,153 @@
 """Shopping API Integration for real product recommendations"""
+import functools
 import requests
+import zlib
+import style_catalog
 from urllib.parse import quote
 
+# Budget-based price filters
+PRICE_RANGES = {
+    'low': (500, 2000),
+    'medium': (2000, 5000),
+    'high': (5000, 15000)
+}
+
+# Gender-specific categories
+GENDER_CATEGORIES = {
+    'female': 'women',
+    'male': 'men',
+    'other': 'unisex'
+}
+
+# Occasion-specific search query templates; {colors} is the palette's first
+# colour names and {gender} the gender category
+OCCASION_QUERIES = {
+    'wedding': (
+        '{colors} wedding {gender}',
+        '{colors} bridal {gender}',
+        '{colors} party gown {gender}',
+        '{colors} ethnic wear {gender}'
+    ),
+    'party': (
+        '{colors} party dress {gender}',
+        '{colors} cocktail {gender}',
+        '{colors} evening wear {gender}',
+        '{colors} party outfit {gender}'
+    ),
+    'work': (
+        'formal shirt {gender}',
+        'blazer {gender}',
+        'office wear {gender}',
+        'formal {gender}'
+    ),
+    'gym': (
+        'sports wear {gender}',
+        'gym outfit {gender}',
+        'activewear {gender}',
+        'workout clothes {gender}'
+    ),
+    'beach': (
+        '{colors} beach wear {gender}',
+        '{colors} swimwear {gender}',
+        '{colors} resort wear {gender}',
+        'beach outfit {gender}'
+    ),
+    'date': (
+        '{colors} date outfit {gender}',
+        '{colors} casual dress {gender}',
+        '{colors} evening wear {gender}',
+        'date night {gender}'
+    ),
+    'festival': (
+        '{colors} festive wear {gender}',
+        '{colors} ethnic {gender}',
+        '{colors} traditional {gender}',
+        'festival outfit {gender}'
+    ),
+    'daily': (
+        '{colors} casual {gender}',
+        '{colors} everyday wear {gender}',
+        'casual outfit {gender}',
+        '{colors} {gender} fashion'
+    ),
+    'college': (
+        '{colors} casual wear {gender}',
+        'college outfit {gender}',
+        '{colors} trendy {gender}',
+        'casual {gender}'
+    ),
+    'interview': (
+        'formal {gender}',
+        'professional wear {gender}',
+        'interview outfit {gender}',
+        'business {gender}'
+    ),
+    'brunch': (
+        '{colors} brunch outfit {gender}',
+        '{colors} casual {gender}',
+        'brunch wear {gender}',
+        '{colors} day wear {gender}'
+    ),
+    'dinner': (
+        '{colors} dinner outfit {gender}',
+        '{colors} elegant {gender}',
+        'dinner wear {gender}',
+        '{colors} evening {gender}'
+    ),
+    'travel': (
+        'travel wear {gender}',
+        'comfortable {gender}',
+        'travel outfit {gender}',
+        'casual {gender}'
+    ),
+    'shopping': (
+        '{colors} casual {gender}',
+        'shopping outfit {gender}',
+        'comfortable {gender}',
+        '{colors} everyday {gender}'
+    ),
+    'concert': (
+        '{colors} concert outfit {gender}',
+        '{colors} trendy {gender}',
+        'concert wear {gender}',
+        '{colors} party {gender}'
+    ),
+}
+
+DEFAULT_QUERIES = (
+    '{colors} {gender} fashion',
+    '{colors} casual {gender}',
+    '{colors} outfit {gender}',
+    '{gender} wear'
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def search_terms(occasion, gender_category, color_keywords):
+    """
+    (term, URL-quoted term) pairs for an occasion, filled in and quoted once
+    per combination
+    """
+    templates = OCCASION_QUERIES.get(occasion, DEFAULT_QUERIES)
+    terms = [template.format(colors=color_keywords, gender=gender_category) for template in templates]
+    return tuple((term, quote(term)) for term in terms)
+
+
+def platform_link(platform, term, quoted):
+    """(product URL, platform name) for a search term on a platform"""
+    if platform == 'amazon':
+        # Amazon India search URL
+        return f"https://www.amazon.in/s?k={quoted}&rh=n:1968024031", 'Amazon'
+    if platform == 'flipkart':
+        # Flipkart search URL with women's fashion filter
+        return f"https://www.flipkart.com/search?q={quoted}&marketplace=FLIPKART", 'Flipkart'
+    if platform == 'myntra':
+        # Myntra search URL
+        search_slug = term.lower().replace(' ', '-')
+        return f"https://www.myntra.com/{search_slug}?rawQuery={quoted}", 'Myntra'
+    return f"https://www.amazon.in/s?k={quoted}", 'Amazon'
+
+
 class ShoppingAPI:
     """Fetch real product data from shopping platforms"""
     
@@ -17,24 +163,24 @@ class ShoppingAPI:
         Search for fashion products with accurate direct links
         Personalized based on skin tone, gender, and color palette
         """
-        
-        # Budget-based price filters
-        price_ranges = {
-            'low': (500, 2000),
-            'medium': (2000, 5000),
-            'high': (5000, 15000)
-        }
-        
-        min_price, max_price = price_ranges.get(budget, (2000, 5000))
-        
-        # Gender-specific categories
-        gender_categories = {
-            'female': 'women',
-            'male': 'men',
-            'other': 'unisex'
-        }
-        
-        gender_category = gender_categories.get(gender, 'women')
+        return self.search_all_platforms(
+            occasion=occasion,
+            budget=budget,
+            limit=limit,
+            platforms=(platform,),
+            skin_tone=skin_tone,
+            gender=gender,
+            color_palette=color_palette
+        )[platform]
+    
+    def search_all_platforms(self, occasion='casual', budget='medium', limit=4, platforms=('amazon', 'flipkart', 'myntra'), skin_tone='Medium', gender='female', color_palette=None):
+        """
+        search_products() for several platforms at once: the search terms,
+        prices and names are worked out once and shared by every platform.
+        Returns {platform: products}.
+        """
+        min_price, max_price = PRICE_RANGES.get(budget, (2000, 5000))
+        gender_category = GENDER_CATEGORIES.get(gender, 'women')
         
         # Extract color names from palette if provided
         color_keywords = ''
@@ -43,215 +189,45 @@ class ShoppingAPI:
             colors = [c.get('name', '') for c in color_palette[:3]]
             color_keywords = ' '.join(colors).lower()
         
-        # Skin tone specific color modifiers (as backup)
-        color_modifiers = {
-            'Fair': ['pastel', 'light', 'soft'],
-            'Medium': ['vibrant', 'bright', 'colorful'],
-            'Olive': ['earthy', 'warm', 'olive'],
-            'Deep': ['bold', 'jewel tone', 'bright']
-        }
-        
-        color_mod = color_modifiers.get(skin_tone, [''])[0] if not color_keywords else ''
-        
-        # Occasion-specific search queries with gender and color
-        occasion_queries = {
-            'wedding': [
-                f'{color_keywords} wedding {gender_category}',
-                f'{color_keywords} bridal {gender_category}',
-                f'{color_keywords} party gown {gender_category}',
-                f'{color_keywords} ethnic wear {gender_category}'
-            ],
-            'party': [
-                f'{color_keywords} party dress {gender_category}',
-                f'{color_keywords} cocktail {gender_category}',
-                f'{color_keywords} evening wear {gender_category}',
-                f'{color_keywords} party outfit {gender_category}'
-            ],
-            'work': [
-                f'formal shirt {gender_category}',
-                f'blazer {gender_category}',
-                f'office wear {gender_category}',
-                f'formal {gender_category}'
-            ],
-            'gym': [
-                f'sports wear {gender_category}',
-                f'gym outfit {gender_category}',
-                f'activewear {gender_category}',
-                f'workout clothes {gender_category}'
-            ],
-            'beach': [
-                f'{color_keywords} beach wear {gender_category}',
-                f'{color_keywords} swimwear {gender_category}',
-                f'{color_keywords} resort wear {gender_category}',
-                f'beach outfit {gender_category}'
-            ],
-            'date': [
-                f'{color_keywords} date outfit {gender_category}',
-                f'{color_keywords} casual dress {gender_category}',
-                f'{color_keywords} evening wear {gender_category}',
-                f'date night {gender_category}'
-            ],
-            'festival': [
-                f'{color_keywords} festive wear {gender_category}',
-                f'{color_keywords} ethnic {gender_category}',
-                f'{color_keywords} traditional {gender_category}',
-                f'festival outfit {gender_category}'
-            ],
-            'daily': [
-                f'{color_keywords} casual {gender_category}',
-                f'{color_keywords} everyday wear {gender_category}',
-                f'casual outfit {gender_category}',
-                f'{color_keywords} {gender_category} fashion'
-            ],
-            'college': [
-                f'{color_keywords} casual wear {gender_category}',
-                f'college outfit {gender_category}',
-                f'{color_keywords} trendy {gender_category}',
-                f'casual {gender_category}'
-            ],
-            'interview': [
-                f'formal {gender_category}',
-                f'professional wear {gender_category}',
-                f'interview outfit {gender_category}',
-                f'business {gender_category}'
-            ],
-            'brunch': [
-                f'{color_keywords} brunch outfit {gender_category}',
-                f'{color_keywords} casual {gender_category}',
-                f'brunch wear {gender_category}',
-                f'{color_keywords} day wear {gender_category}'
-            ],
-            'dinner': [
-                f'{color_keywords} dinner outfit {gender_category}',
-                f'{color_keywords} elegant {gender_category}',
-                f'dinner wear {gender_category}',
-                f'{color_keywords} evening {gender_category}'
-            ],
-            'travel': [
-                f'travel wear {gender_category}',
-                f'comfortable {gender_category}',
-                f'travel outfit {gender_category}',
-                f'casual {gender_category}'
-            ],
-            'shopping': [
-                f'{color_keywords} casual {gender_category}',
-                f'shopping outfit {gender_category}',
-                f'comfortable {gender_category}',
-                f'{color_keywords} everyday {gender_category}'
-            ],
-            'concert': [
-                f'{color_keywords} concert outfit {gender_category}',
-                f'{color_keywords} trendy {gender_category}',
-                f'concert wear {gender_category}',
-                f'{color_keywords} party {gender_category}'
-            ],
-        }
-        
-        search_terms = occasion_queries.get(occasion, [
-            f'{color_keywords} {gender_category} fashion',
-            f'{color_keywords} casual {gender_category}',
-            f'{color_keywords} outfit {gender_category}',
-            f'{gender_category} wear'
-        ])
-        
-        # Generate product recommendations
-        products = []
-        
-        for i, term in enumerate(search_terms[:limit]):
-            # Create accurate platform-specific URLs
-            if platform == 'amazon':
-                # Amazon India search URL
-                product_url = f"https://www.amazon.in/s?k={quote(term)}&rh=n:1968024031"
-                platform_name = 'Amazon'
-            elif platform == 'flipkart':
-                # Flipkart search URL with women's fashion filter
-                product_url = f"https://www.flipkart.com/search?q={quote(term)}&marketplace=FLIPKART"
-                platform_name = 'Flipkart'
-            elif platform == 'myntra':
-                # Myntra search URL
-                search_slug = term.lower().replace(' ', '-')
-                product_url = f"https://www.myntra.com/{search_slug}?rawQuery={quote(term)}"
-                platform_name = 'Myntra'
-            else:
-                product_url = f"https://www.amazon.in/s?k={quote(term)}"
-                platform_name = 'Amazon'
-            
-            # Product data
-            product = {
+        results = {platform: [] for platform in platforms}
+        for i, (term, quoted) in enumerate(search_terms(occasion, gender_category, color_keywords)[:limit]):
+            shared = {
                 'id': i + 1,
                 'name': self._format_product_name(term),
                 'category': term,
-                'price': self._generate_price(min_price, max_price),
-                'url': product_url,
-                'platform': platform_name,
-                'rating': round(4.0 + (i % 10) * 0.1, 1),
-                'reviews': 100 + (i * 50)
+                'price': self._generate_price(min_price, max_price, term)
             }
-            products.append(product)
+            rating = round(4.0 + (i % 10) * 0.1, 1)
+            for platform in platforms:
+                product_url, platform_name = platform_link(platform, term, quoted)
+                results[platform].append({
+                    **shared,
+                    'url': product_url,
+                    'platform': platform_name,
+                    'rating': rating,
+                    'reviews': 100 + (i * 50)
+                })
         
-        return products
+        return results
     
     def _format_product_name(self, term):
         """Format search term into product name"""
         return term.title().replace('Women', '').strip()
     
-    def _generate_price(self, min_price, max_price):
-        """Generate realistic price within range"""
-        import random
-        price = random.randint(min_price, max_price)
+    def _generate_price(self, min_price, max_price, term):
+        """
+        Generate realistic price within range. Derived from the search term
+        so the same search always shows the same price (and identical
+        fallback responses can be served from cache).
+        """
+        price = min_price + zlib.crc32(term.encode('utf-8')) % (max_price - min_price + 1)
         # Round to nearest 99
         price = (price // 100) * 100 + 99
         return price
     
     def _get_placeholder_image(self, category):
-        """
-        Get product images using reliable placeholder service
-        """
-        # Use a combination of services for better reliability
-        
-        # Map categories to specific image IDs or keywords
-        image_map = {
-            'wedding lehenga': 'https://images.unsplash.com/photo-1583391733956-6c78276477e2?w=400&h=500&fit=crop',
-            'bridal saree': 'https://images.unsplash.com/photo-1610030469983-98e550d6193c?w=400&h=500&fit=crop',
-            'party gown': 'https://images.unsplash.com/photo-1566174053879-31528523f8ae?w=400&h=500&fit=crop',
-            'party dress': 'https://images.unsplash.com/photo-1515372039744-b8f02a3ae446?w=400&h=500&fit=crop',
-            'cocktail dress': 'https://images.unsplash.com/photo-1566174053879-31528523f8ae?w=400&h=500&fit=crop',
-            'evening gown': 'https://images.unsplash.com/photo-1595777457583-95e059d581b8?w=400&h=500&fit=crop',
-            'formal shirt': 'https://images.unsplash.com/photo-1596755094514-f87e34085b2c?w=400&h=500&fit=crop',
-            'blazer women': 'https://images.unsplash.com/photo-1591369822096-ffd140ec948f?w=400&h=500&fit=crop',
-            'office wear': 'https://images.unsplash.com/photo-1573496359142-b8d87734a5a2?w=400&h=500&fit=crop',
-            'formal trousers': 'https://images.unsplash.com/photo-1594633312681-425c7b97ccd1?w=400&h=500&fit=crop',
-            'sports bra': 'https://images.unsplash.com/photo-1518310952931-b1de897abd40?w=400&h=500&fit=crop',
-            'gym leggings': 'https://images.unsplash.com/photo-1506629082955-511b1aa562c8?w=400&h=500&fit=crop',
-            'workout top': 'https://images.unsplash.com/photo-1571019613454-1cb2f99b2d8b?w=400&h=500&fit=crop',
-            'activewear': 'https://images.unsplash.com/photo-1518310952931-b1de897abd40?w=400&h=500&fit=crop',
-            'swimsuit': 'https://images.unsplash.com/photo-1582639510494-c80b5de9f148?w=400&h=500&fit=crop',
-            'beach dress': 'https://images.unsplash.com/photo-1572804013309-59a88b7e92f1?w=400&h=500&fit=crop',
-            'bikini': 'https://images.unsplash.com/photo-1582639510494-c80b5de9f148?w=400&h=500&fit=crop',
-            'resort wear': 'https://images.unsplash.com/photo-1572804013309-59a88b7e92f1?w=400&h=500&fit=crop',
-            'date night dress': 'https://images.unsplash.com/photo-1595777457583-95e059d581b8?w=400&h=500&fit=crop',
-            'casual dress': 'https://images.unsplash.com/photo-1572804013309-59a88b7e92f1?w=400&h=500&fit=crop',
-            'midi dress': 'https://images.unsplash.com/photo-1595777457583-95e059d581b8?w=400&h=500&fit=crop',
-            'jumpsuit': 'https://images.unsplash.com/photo-1594633312681-425c7b97ccd1?w=400&h=500&fit=crop',
-            'festive wear': 'https://images.unsplash.com/photo-1610030469983-98e550d6193c?w=400&h=500&fit=crop',
-            'ethnic kurta': 'https://images.unsplash.com/photo-1610030469983-98e550d6193c?w=400&h=500&fit=crop',
-            'traditional dress': 'https://images.unsplash.com/photo-1583391733956-6c78276477e2?w=400&h=500&fit=crop',
-            'indo western': 'https://images.unsplash.com/photo-1583391733956-6c78276477e2?w=400&h=500&fit=crop',
-            'casual top': 'https://images.unsplash.com/photo-1596755094514-f87e34085b2c?w=400&h=500&fit=crop',
-            'jeans': 'https://images.unsplash.com/photo-1542272604-787c3835535d?w=400&h=500&fit=crop',
-            'kurti': 'https://images.unsplash.com/photo-1610030469983-98e550d6193c?w=400&h=500&fit=crop',
-            'denim jacket': 'https://images.unsplash.com/photo-1551028719-00167b16eac5?w=400&h=500&fit=crop',
-            'crop top': 'https://images.unsplash.com/photo-1594633312681-425c7b97ccd1?w=400&h=500&fit=crop',
-            'sneakers': 'https://images.unsplash.com/photo-1549298916-b41d501d3772?w=400&h=500&fit=crop',
-            'formal blazer': 'https://images.unsplash.com/photo-1591369822096-ffd140ec948f?w=400&h=500&fit=crop',
-            'casual wear': 'https://images.unsplash.com/photo-1515372039744-b8f02a3ae446?w=400&h=500&fit=crop',
-        }
-        
-        # Get image URL from map or use default
-        image_url = image_map.get(category.lower(), 
-            'https://images.unsplash.com/photo-1515372039744-b8f02a3ae446?w=400&h=500&fit=crop')
-        
-        return image_url
+        """Product image URL for a category, from the style catalog"""
+        return style_catalog.current().placeholder_image(category)
     
     def get_trending_products(self, limit=6):
         """Get trending fashion products"""
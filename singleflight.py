@@ -0,0 +1,134 @@
+"""Coalesce concurrent identical calls so only one of them does the work"""
+import threading
+
+
+class _Call:
+    """One in-flight call and the callers waiting for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Stream:
+    """One in-flight generator and everything it has produced so far"""
+
+    def __init__(self):
+        self.changed = threading.Condition()
+        self.items = []
+        self.done = False
+        self.error = None
+
+
+class SingleFlight:
+    """
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for and share its result (or exception). Nothing is
+    kept once the call finishes, so this is not a cache.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'coalesced': 0, 'timeouts': 0}
+
+    def do(self, key, fn, *args, timeout=None, detach=False, **kwargs):
+        """
+        Return fn(*args, **kwargs), sharing one execution among concurrent
+        callers with the same key. Exceptions raised by fn reach every
+        caller; a waiter gives up with TimeoutError after `timeout` seconds.
+        With detach=True the call runs on its own thread, so the first caller
+        can time out too while the call carries on to completion.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+                self._counters['calls'] += 1
+            else:
+                leader = False
+                self._counters['coalesced'] += 1
+
+        if leader and detach:
+            threading.Thread(target=self._run, args=(key, call, fn, args, kwargs), daemon=True).start()
+        elif leader:
+            self._run(key, call, fn, args, kwargs)
+
+        if not call.done.wait(timeout):
+            with self._lock:
+                self._counters['timeouts'] += 1
+            raise TimeoutError(f'Timed out after {timeout}s waiting for in-flight call')
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stream(self, key, fn, *args, timeout=None, **kwargs):
+        """
+        Yield the items of the generator fn(*args, **kwargs), sharing one
+        run among concurrent callers with the same key. The run happens on
+        its own thread, so it finishes even if every caller stops reading;
+        a caller arriving mid-run first gets the items produced so far.
+        An exception raised by fn reaches every caller after the items
+        before it; a caller gives up with TimeoutError when no new item
+        arrives within `timeout` seconds.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Stream()
+                self._counters['calls'] += 1
+                threading.Thread(target=self._pump, args=(key, call, fn, args, kwargs), daemon=True).start()
+            else:
+                self._counters['coalesced'] += 1
+
+        seen = 0
+        while True:
+            with call.changed:
+                if not call.changed.wait_for(lambda: call.done or len(call.items) > seen, timeout):
+                    with self._lock:
+                        self._counters['timeouts'] += 1
+                    raise TimeoutError(f'Timed out after {timeout}s waiting for in-flight stream')
+                items = call.items[seen:]
+                finished = call.done
+            yield from items
+            seen += len(items)
+            if finished and seen == len(call.items):
+                break
+
+        if call.error is not None:
+            raise call.error
+
+    def _pump(self, key, call, fn, args, kwargs):
+        try:
+            for item in fn(*args, **kwargs):
+                with call.changed:
+                    call.items.append(item)
+                    call.changed.notify_all()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            with call.changed:
+                call.done = True
+                call.changed.notify_all()
+
+    def _run(self, key, call, fn, args, kwargs):
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Leader calls, coalesced waiters, waiter timeouts and calls in flight"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['in_flight'] = len(self._calls)
+        return stats
@@ -1,27 +1,116 @@
+import io
+import os
 import cv2
 import numpy as np
 from PIL import Image
+from color_analysis import histogram_median, histogram_trimmed_mean, reduced_decode_scale
+from color_classifier import SKIN_TONES, UNDERTONES, classify, classify_colors, tone_histogram
+from result_cache import sha256_bytes, sha256_file, sha256_stream
+
+# OpenCV decode flags for reduced-resolution reads
+REDUCED_COLOR_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8
+}
+
+# Run the face cascade on a copy whose long side is at most this many pixels
+DETECT_MAX_SIDE = 640
+
+# A selfie face spans at least this fraction of the image's shorter side
+MIN_FACE_FRACTION = 0.1
+
+# Skin colour estimators: fixed cheek rectangles, or a YCrCb skin mask over
+# the whole face summarised by a trimmed mean or median of its histogram
+ESTIMATORS = ('cheeks', 'mask', 'mask_median')
+
+# YCrCb skin ranges (Y, Cr, Cb)
+SKIN_YCRCB_LOWER = (0, 133, 77)
+SKIN_YCRCB_UPPER = (255, 173, 127)
+
+# Per-image budget for the mask estimator; larger faces are subsampled
+MASK_MAX_PIXELS = 40_000
+
+# Fall back to the cheek estimator when less of the face than this is skin
+MIN_SKIN_FRACTION = 0.05
+
+# Fraction of skin pixels dropped from each tail by the trimmed mean
+SKIN_TRIM = 0.1
+
+# Cheek sample rectangles as fractions of the face box (avoid eyes, nose, mouth)
+CHEEK_ROWS = (0.4, 0.7)
+CHEEK_LEFT_COLS = (0.1, 0.35)
+CHEEK_RIGHT_COLS = (0.65, 0.9)
 
 class SkinAnalyzer:
     """Analyzes facial images to detect skin tone and undertone"""
     
-    def __init__(self):
+    def __init__(self, pixel_budget=None, cache=None, detect_max_side=DETECT_MAX_SIDE,
+                 min_face_size=None, max_face_size=None, estimator='cheeks'):
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"estimator must be one of {ESTIMATORS}")
+        
         # Load face detection cascade
         self.face_cascade = cv2.CascadeClassifier(
             cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
         )
+        # Decode large images at 1/2, 1/4 or 1/8 scale down to this many pixels
+        self.pixel_budget = pixel_budget
+        # Optional result_cache.TieredCache keyed by SHA-256 of the image bytes
+        self.cache = cache
+        # Face detection runs downscaled; sizes are full-resolution pixels
+        # (min defaults to MIN_FACE_FRACTION of the shorter image side)
+        self.detect_max_side = detect_max_side
+        self.min_face_size = min_face_size
+        self.max_face_size = max_face_size
+        self.estimator = estimator
+        self._cache_prefix = (f"{estimator}:{pixel_budget or 0}:{detect_max_side or 0}:"
+                              f"{min_face_size or 0}:{max_face_size or 0}")
+    
+    def analyze(self, image):
+        """Main analysis function (image is a path, bytes or file-like object)"""
+        return self._cached('face', image, self._analyze)
+    
+    def analyze_faces(self, image):
+        """
+        Classify every detected face (group photos), ordered left to right.
+        Faces in group shots are small, so a larger detect_max_side and
+        min_face_size than the selfie defaults usually work better.
+        """
+        return self._cached('faces', image, self._analyze_faces)
     
-    def analyze(self, image_path):
-        """Main analysis function"""
+    def _cached(self, kind, image, analyze):
+        """Run an analysis through the optional content-addressed cache"""
+        if self.cache is None:
+            return analyze(image)
+        
+        cache_key = f"{kind}:{self._cache_prefix}:{self._digest(image)}"
+        result = self.cache.get(cache_key)
+        if result is None:
+            result = analyze(image)
+            if result.get('success'):
+                self.cache.set(cache_key, result)
+        return result
+    
+    def _digest(self, image):
+        """SHA-256 of the image bytes, streamed for files"""
+        if isinstance(image, (str, os.PathLike)):
+            return sha256_file(image)
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return sha256_bytes(image)
+        return sha256_stream(image)
+    
+    def _analyze(self, image):
+        """Decode, detect the face and classify its skin colour"""
         try:
             # Read image
-            img = cv2.imread(image_path)
+            img = self._read_image(image)
             if img is None:
                 return {'error': 'Could not read image'}
             
             # Detect face
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
+            faces = self._detect_faces(img)
             
             if len(faces) == 0:
                 return {'error': 'No face detected'}
@@ -32,81 +121,265 @@ class SkinAnalyzer:
             # Extract face region
             face_roi = img[y:y+h, x:x+w]
             
-            # Extract skin region (cheek area)
-            skin_region = self._extract_skin_region(face_roi)
-            
-            # Calculate average color
-            avg_color = self._calculate_average_color(skin_region)
+            # Estimate the skin colour of the face
+            avg_color = self._estimate_skin_color(face_roi)
             
-            # Classify skin tone
-            skin_tone = self._classify_skin_tone(avg_color)
+            # Classify skin tone and undertone
+            skin_tone, undertone = classify(avg_color)
             
-            # Detect undertone
-            undertone = self._detect_undertone(avg_color)
-            
-            return {
+            result = {
                 'success': True,
                 'skin_tone': skin_tone,
                 'undertone': undertone,
                 'rgb': avg_color.tolist(),
                 'hex': self._rgb_to_hex(avg_color)
             }
+            
+            # Share of cheek pixels in each tone; optional extra, never fatal
+            try:
+                result['tone_mix'] = self._tone_mix(face_roi)
+            except Exception as e:
+                print(f"Tone histogram failed: {e}")
+            
+            return result
         
         except Exception as e:
             return {'error': str(e)}
     
-    def _extract_skin_region(self, face_roi):
-        """Extract skin region from face (cheek area)"""
-        h, w = face_roi.shape[:2]
+    def _analyze_faces(self, image):
+        """Decode once, detect all faces and classify them in one batch"""
+        try:
+            img = self._read_image(image)
+            if img is None:
+                return {'error': 'Could not read image'}
+            
+            faces = self._detect_faces(img)
+            if len(faces) == 0:
+                return {'error': 'No face detected'}
+            
+            boxes = np.asarray(faces, dtype=np.int64)
+            boxes = boxes[np.argsort(boxes[:, 0], kind='stable')]
+            
+            colors = self._batch_skin_colors(img, boxes)
+            tones, undertones = classify_colors(colors, exact=True)
+            
+            return {
+                'success': True,
+                'count': len(boxes),
+                'faces': [
+                    {
+                        'box': box.tolist(),
+                        'skin_tone': SKIN_TONES[tone],
+                        'undertone': UNDERTONES[undertone],
+                        'rgb': rgb.tolist(),
+                        'hex': self._rgb_to_hex(rgb)
+                    }
+                    for box, rgb, tone, undertone in zip(boxes, colors, tones, undertones)
+                ]
+            }
         
-        # Define cheek regions (avoid eyes, nose, mouth)
-        cheek_left = face_roi[int(h*0.4):int(h*0.7), int(w*0.1):int(w*0.35)]
-        cheek_right = face_roi[int(h*0.4):int(h*0.7), int(w*0.65):int(w*0.9)]
+        except Exception as e:
+            return {'error': str(e)}
+    
+    def _batch_skin_colors(self, img, boxes):
+        """
+        RGB skin colour of every (x, y, w, h) face box at once. Cheek sums
+        come from one integral image and mask histograms from one bincount
+        over all faces, so the cost grows with pixels rather than the number
+        of faces. Each face gets the same colour as analyze() would give it.
+        """
+        x, y, w, h = boxes.T
+        top, bottom = (y + (h * CHEEK_ROWS[0]).astype(int), y + (h * CHEEK_ROWS[1]).astype(int))
+        
+        integral = cv2.integral(img, sdepth=cv2.CV_64F)
+        sums = np.zeros((len(boxes), 3))
+        counts = np.zeros(len(boxes))
+        for start, stop in (CHEEK_LEFT_COLS, CHEEK_RIGHT_COLS):
+            left, right = x + (w * start).astype(int), x + (w * stop).astype(int)
+            sums += _rect_sums(integral, top, bottom, left, right)
+            counts += (bottom - top) * (right - left)
+        
+        # BGR sums -> RGB integer means
+        colors = (sums / np.maximum(counts, 1)[:, None]).astype(int)[:, ::-1]
+        
+        if self.estimator != 'cheeks':
+            masked, enough_skin = self._batch_masked_colors(img, boxes)
+            colors = np.where(enough_skin[:, None], masked, colors)
+        return colors
+    
+    def _batch_masked_colors(self, img, boxes):
+        """
+        The mask estimator for every face box in one pass: the pixels
+        _estimate_masked_color samples from each face (the same nearest-
+        neighbour grid for faces over MASK_MAX_PIXELS) are gathered at once,
+        masked, and binned into (face, channel, value) histograms with a
+        single bincount. Returns (RGB colours, whether each face had enough skin).
+        """
+        x, y, w, h = boxes.T
+        step = np.where(w * h > MASK_MAX_PIXELS, np.ceil(np.sqrt(w * h / MASK_MAX_PIXELS)), 1).astype(int)
+        grid_w = np.maximum(1, w // step)
+        grid_h = np.maximum(1, h // step)
+        sizes = grid_w * grid_h
+        
+        # (face, row, col) of every sample, row-major within each face
+        face = np.repeat(np.arange(len(boxes)), sizes)
+        local = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        row, col = local // grid_w[face], local % grid_w[face]
+        
+        # cv2.resize INTER_NEAREST: src = min(floor(dst / (dst_size / src_size)), src_size - 1)
+        row = np.minimum(np.floor(row * (1.0 / (grid_h / h))[face]).astype(int), h[face] - 1)
+        col = np.minimum(np.floor(col * (1.0 / (grid_w / w))[face]).astype(int), w[face] - 1)
+        pixels = img[y[face] + row, x[face] + col]
+        
+        ycrcb = cv2.cvtColor(pixels[:, None, :], cv2.COLOR_BGR2YCrCb)
+        skin = cv2.inRange(ycrcb, SKIN_YCRCB_LOWER, SKIN_YCRCB_UPPER).ravel() > 0
+        enough_skin = np.bincount(face[skin], minlength=len(boxes)) >= MIN_SKIN_FRACTION * sizes
+        
+        # Histograms in RGB order (the pixels are BGR)
+        face, pixels = face[skin], pixels[skin][:, ::-1].astype(np.int64)
+        bins = (face[:, None] * 3 + np.arange(3)) * 256 + pixels
+        hist = np.bincount(bins.ravel(), minlength=len(boxes) * 3 * 256).reshape(len(boxes), 3, 256)
+        
+        if self.estimator == 'mask_median':
+            return histogram_median(hist).astype(int), enough_skin
+        return histogram_trimmed_mean(hist, SKIN_TRIM).astype(int), enough_skin
+    
+    def _detect_faces(self, img):
+        """
+        Run the cascade on a downscaled grayscale copy and map the boxes back
+        to full-resolution (x, y, w, h) so the skin sample keeps full fidelity
+        """
+        height, width = img.shape[:2]
+        scale = 1.0
+        small = img
+        if self.detect_max_side and max(height, width) > self.detect_max_side:
+            scale = self.detect_max_side / max(height, width)
+            small = cv2.resize(img, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
         
-        # Combine cheeks
-        skin_region = np.vstack([cheek_left, cheek_right])
+        # Skip cascade scales that cannot hold a selfie-sized face
+        min_side = self.min_face_size or int(min(height, width) * MIN_FACE_FRACTION)
+        min_side = max(1, int(min_side * scale))
+        kwargs = {'minSize': (min_side, min_side)}
+        if self.max_face_size:
+            max_side = max(min_side, int(self.max_face_size * scale))
+            kwargs['maxSize'] = (max_side, max_side)
         
-        return skin_region
+        faces = self.face_cascade.detectMultiScale(gray, 1.3, 5, **kwargs)
+        if len(faces) == 0 or scale == 1.0:
+            return faces
+        
+        boxes = np.round(np.asarray(faces, dtype=np.float64) / scale).astype(int)
+        boxes[:, 0] = np.clip(boxes[:, 0], 0, width - 1)
+        boxes[:, 1] = np.clip(boxes[:, 1], 0, height - 1)
+        boxes[:, 2] = np.minimum(boxes[:, 2], width - boxes[:, 0])
+        boxes[:, 3] = np.minimum(boxes[:, 3], height - boxes[:, 1])
+        return boxes
+    
+    def _read_image(self, image):
+        """
+        Read a BGR image from a path, raw bytes or a file-like object,
+        at reduced resolution when a pixel budget is set
+        """
+        if isinstance(image, (str, os.PathLike)):
+            return cv2.imread(os.fspath(image), self._decode_flag(image))
+        
+        data = image if isinstance(image, (bytes, bytearray, memoryview)) else image.read()
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        return cv2.imdecode(buffer, self._decode_flag(io.BytesIO(data)))
     
-    def _calculate_average_color(self, region):
-        """Calculate average RGB color"""
-        # Convert BGR to RGB
-        region_rgb = cv2.cvtColor(region, cv2.COLOR_BGR2RGB)
+    def _decode_flag(self, source):
+        """
+        OpenCV read flag for the configured pixel budget. Formats PIL cannot
+        parse (e.g. PFM, Radiance HDR) are decoded at full size, and OpenCV
+        alone decides whether the bytes are an image at all.
+        """
+        if not self.pixel_budget:
+            return cv2.IMREAD_COLOR
+        
+        # Only the header is parsed here; the pixels are decoded by OpenCV
+        try:
+            with Image.open(source) as probe:
+                width, height = probe.size
+        except Exception:
+            return cv2.IMREAD_COLOR
         
-        # Calculate mean
-        avg_color = np.mean(region_rgb.reshape(-1, 3), axis=0)
+        return REDUCED_COLOR_FLAGS[reduced_decode_scale(width, height, self.pixel_budget)]
+    
+    def _estimate_skin_color(self, face_roi):
+        """RGB skin colour of a BGR face ROI using the configured estimator"""
+        if self.estimator != 'cheeks':
+            avg_color = self._estimate_masked_color(face_roi)
+            if avg_color is not None:
+                return avg_color
         
-        return avg_color.astype(int)
+        # Extract skin region (cheek area) and calculate average color
+        cheeks = self._extract_skin_region(face_roi)
+        return self._calculate_average_color(cheeks)
     
-    def _classify_skin_tone(self, rgb):
-        """Classify skin tone into categories"""
-        # Calculate brightness
-        brightness = (rgb[0] + rgb[1] + rgb[2]) / 3
+    def _tone_mix(self, face_roi):
+        """Tone histogram of the cheek views via the lookup table (BGR -> RGB views)"""
+        return tone_histogram(*(cheek[..., ::-1] for cheek in self._extract_skin_region(face_roi)))
+    
+    def _estimate_masked_color(self, face_roi):
+        """
+        Single-pass skin estimate: YCrCb mask over the face, per-channel
+        histograms of the masked pixels, then a trimmed mean or median.
+        Works on the ROI view directly; only faces over MASK_MAX_PIXELS are
+        subsampled. Returns None when too little of the face looks like skin.
+        """
+        h, w = face_roi.shape[:2]
+        if h * w > MASK_MAX_PIXELS:
+            step = int(np.ceil(np.sqrt(h * w / MASK_MAX_PIXELS)))
+            face_roi = cv2.resize(face_roi, (max(1, w // step), max(1, h // step)),
+                                  interpolation=cv2.INTER_NEAREST)
         
-        if brightness > 200:
-            return 'Fair'
-        elif brightness > 160:
-            return 'Medium'
-        elif brightness > 120:
-            return 'Olive'
-        else:
-            return 'Deep'
+        ycrcb = cv2.cvtColor(face_roi, cv2.COLOR_BGR2YCrCb)
+        mask = cv2.inRange(ycrcb, SKIN_YCRCB_LOWER, SKIN_YCRCB_UPPER)
+        if cv2.countNonZero(mask) < MIN_SKIN_FRACTION * mask.size:
+            return None
+        
+        # Histograms in RGB order (the ROI is BGR)
+        hist = np.stack([
+            cv2.calcHist([face_roi], [channel], mask, [256], [0, 256]).ravel()
+            for channel in (2, 1, 0)
+        ])
+        
+        if self.estimator == 'mask_median':
+            return histogram_median(hist).astype(int)
+        return histogram_trimmed_mean(hist, SKIN_TRIM).astype(int)
     
-    def _detect_undertone(self, rgb):
-        """Detect warm/cool/neutral undertone"""
-        r, g, b = rgb
+    def _extract_skin_region(self, face_roi):
+        """
+        Cheek areas of the face as (left, right) views. The two widths can
+        differ by a column, so they are never stacked into one array.
+        """
+        h, w = face_roi.shape[:2]
         
-        # Calculate ratios
-        red_ratio = r / (g + b + 1)
-        blue_ratio = b / (r + g + 1)
+        # Define cheek regions (avoid eyes, nose, mouth)
+        rows = slice(int(h*CHEEK_ROWS[0]), int(h*CHEEK_ROWS[1]))
+        cheek_left = face_roi[rows, int(w*CHEEK_LEFT_COLS[0]):int(w*CHEEK_LEFT_COLS[1])]
+        cheek_right = face_roi[rows, int(w*CHEEK_RIGHT_COLS[0]):int(w*CHEEK_RIGHT_COLS[1])]
+        
+        return cheek_left, cheek_right
+    
+    def _calculate_average_color(self, regions):
+        """Average RGB color over all pixels of the given BGR regions"""
+        sums = np.zeros(3)
+        count = 0
+        for region in regions:
+            sums += region.sum(axis=(0, 1))
+            count += region.shape[0] * region.shape[1]
         
-        if red_ratio > 0.55:
-            return 'warm'
-        elif blue_ratio > 0.35:
-            return 'cool'
-        else:
-            return 'neutral'
+        # BGR -> RGB
+        return (sums / max(count, 1))[::-1].astype(int)
     
     def _rgb_to_hex(self, rgb):
         """Convert RGB to hex color"""
         return '#{:02x}{:02x}{:02x}'.format(rgb[0], rgb[1], rgb[2])
+
+def _rect_sums(integral, top, bottom, left, right):
+    """Sums over many rectangles of an integral image, one row per rectangle"""
+    return (integral[bottom, right] - integral[top, right]
+            - integral[bottom, left] + integral[top, left])
@@ -1,6 +1,6 @@
 // StyleAI+ Frontend Application
 
-let uploadedFilePath = null;
+let uploadedFile = null;
 let analysisResult = null;
 let currentLanguage = 'en';
 let currentTheme = 'pink';
@@ -172,7 +172,7 @@ function setupEventListeners() {
         document.getElementById('preview-container').style.display = 'none';
         document.getElementById('upload-area').style.display = 'block';
         document.getElementById('analyze-btn').disabled = true;
-        uploadedFilePath = null;
+        uploadedFile = null;
     });
 
     // Analyze button
@@ -184,7 +184,7 @@ function setupEventListeners() {
         document.getElementById('preview-container').style.display = 'none';
         document.getElementById('upload-area').style.display = 'block';
         document.getElementById('analyze-btn').disabled = true;
-        uploadedFilePath = null;
+        uploadedFile = null;
     });
 
     // Feedback buttons
@@ -209,47 +209,32 @@ function updateTranslations() {
     });
 }
 
-async function handleFileUpload(file) {
-    const formData = new FormData();
-    formData.append('image', file);
-
-    try {
-        const response = await fetch('/upload', {
-            method: 'POST',
-            body: formData
-        });
-
-        const result = await response.json();
-
-        if (result.success) {
-            uploadedFilePath = result.filepath;
-            
-            // Show preview
-            const reader = new FileReader();
-            reader.onload = (e) => {
-                document.getElementById('preview-image').src = e.target.result;
-                document.getElementById('upload-area').style.display = 'none';
-                document.getElementById('preview-container').style.display = 'block';
-                document.getElementById('analyze-btn').disabled = false;
-            };
-            reader.readAsDataURL(file);
-        } else {
-            alert('Upload failed: ' + result.error);
-        }
-    } catch (error) {
-        alert('Upload error: ' + error.message);
-    }
+function handleFileUpload(file) {
+    // Keep the file in the browser; it is sent once, straight to /analyze
+    uploadedFile = file;
+
+    // Show preview
+    const reader = new FileReader();
+    reader.onload = (e) => {
+        document.getElementById('preview-image').src = e.target.result;
+        document.getElementById('upload-area').style.display = 'none';
+        document.getElementById('preview-container').style.display = 'block';
+        document.getElementById('analyze-btn').disabled = false;
+    };
+    reader.readAsDataURL(file);
 }
 
 async function analyzeImage() {
     showSection('loading-section');
 
     try {
-        // Step 1: Analyze skin tone
+        // Step 1: Upload and analyze skin tone in one request
+        const formData = new FormData();
+        formData.append('image', uploadedFile);
+
         const analyzeResponse = await fetch('/analyze', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ filepath: uploadedFilePath })
+            body: formData
         });
 
         analysisResult = await analyzeResponse.json();
@@ -260,48 +245,105 @@ async function analyzeImage() {
             return;
         }
 
-        // Step 2: Get recommendations
+        // Step 2: Stream recommendations; built-in results arrive first,
+        // AI sections replace them as they are generated
         const vibe = document.getElementById('vibe-select').value;
         const occasion = document.getElementById('occasion-select').value;
         const budget = document.getElementById('budget-select').value;
 
-        const recommendResponse = await fetch('/recommend', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                skin_tone: analysisResult.skin_tone,
-                undertone: analysisResult.undertone,
-                gender: currentGender,
-                vibe: vibe,
-                occasion: occasion,
-                budget: budget,
-                user_id: 'guest'
-            })
+        await streamRecommendations({
+            skin_tone: analysisResult.skin_tone,
+            undertone: analysisResult.undertone,
+            gender: currentGender,
+            vibe: vibe,
+            occasion: occasion,
+            budget: budget,
+            user_id: 'guest'
         });
 
-        // Check if response is JSON
-        const contentType = recommendResponse.headers.get('content-type');
-        if (!contentType || !contentType.includes('application/json')) {
-            const errorText = await recommendResponse.text();
-            console.error('Server returned non-JSON response:', errorText);
-            alert('Server error: Expected JSON response but got HTML. Check console for details.');
-            showSection('upload-section');
-            return;
-        }
+    } catch (error) {
+        alert('Error: ' + error.message);
+        showSection('upload-section');
+    }
+}
+
+async function streamRecommendations(body) {
+    const response = await fetch('/recommend/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
 
-        const recommendations = await recommendResponse.json();
+    const contentType = response.headers.get('content-type');
+    if (!response.ok || !contentType || !contentType.includes('text/event-stream')) {
+        console.error('Streaming unavailable, status:', response.status);
+        return fetchRecommendations(body);
+    }
 
-        if (recommendations.success) {
-            displayResults(analysisResult, recommendations);
-            showSection('results-section');
-        } else {
-            alert('Recommendation failed: ' + (recommendations.error || 'Unknown error'));
-            console.error('Recommendation error:', recommendations);
-            showSection('upload-section');
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            handleStreamEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
         }
+    }
+}
 
-    } catch (error) {
-        alert('Error: ' + error.message);
+function handleStreamEvent(raw) {
+    let event = 'message';
+    let data = '';
+    raw.split('\n').forEach(line => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+    });
+    const payload = data ? JSON.parse(data) : {};
+
+    if (event === 'local') {
+        displayResults(analysisResult, payload);
+        showSection('results-section');
+    } else if (event === 'section') {
+        renderSection(payload.name, payload.value);
+    } else if (event === 'shopping') {
+        displayShoppingByPlatform(payload);
+    } else if (event === 'error') {
+        console.error('AI recommendations unavailable:', payload.error);
+    }
+}
+
+async function fetchRecommendations(body) {
+    const recommendResponse = await fetch('/recommend', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+
+    // Check if response is JSON
+    const contentType = recommendResponse.headers.get('content-type');
+    if (!contentType || !contentType.includes('application/json')) {
+        const errorText = await recommendResponse.text();
+        console.error('Server returned non-JSON response:', errorText);
+        alert('Server error: Expected JSON response but got HTML. Check console for details.');
+        showSection('upload-section');
+        return;
+    }
+
+    const recommendations = await recommendResponse.json();
+
+    if (recommendations.success) {
+        displayResults(analysisResult, recommendations);
+        showSection('results-section');
+    } else {
+        alert('Recommendation failed: ' + (recommendations.error || 'Unknown error'));
+        console.error('Recommendation error:', recommendations);
         showSection('upload-section');
     }
 }
@@ -311,12 +353,35 @@ function displayResults(analysis, recommendations) {
     document.getElementById('skin-tone-result').textContent = 
         `${analysis.skin_tone} skin with ${analysis.undertone} undertones`;
 
-    // Color palette
+    ['color_palette', 'outfits', 'accessories', 'hairstyle', 'explanation'].forEach(name => {
+        renderSection(name, recommendations[name]);
+    });
+
+    // Shopping (real products by platform)
+    if (recommendations.shopping) {
+        displayShoppingByPlatform(recommendations.shopping);
+    } else {
+        displayShoppingByPlatform();
+    }
+}
+
+function renderSection(name, value) {
+    if (name === 'color_palette') renderColorPalette(value);
+    else if (name === 'outfits') renderOutfits(value);
+    else if (name === 'accessories') renderAccessories(value);
+    else if (name === 'hairstyle') renderHairstyles(value);
+    else if (name === 'explanation') {
+        document.getElementById('explanation-text').textContent = 
+            value || 'These recommendations are personalized for you!';
+    }
+}
+
+function renderColorPalette(palette) {
     const colorPalette = document.getElementById('color-palette');
     colorPalette.innerHTML = '';
     
-    if (recommendations.color_palette) {
-        recommendations.color_palette.forEach(color => {
+    if (palette) {
+        palette.forEach(color => {
             const colorItem = document.createElement('div');
             colorItem.className = 'color-item';
             colorItem.innerHTML = `
@@ -326,13 +391,14 @@ function displayResults(analysis, recommendations) {
             colorPalette.appendChild(colorItem);
         });
     }
+}
 
-    // Outfits
+function renderOutfits(outfits) {
     const outfitsGrid = document.getElementById('outfits-grid');
     outfitsGrid.innerHTML = '';
     
-    if (recommendations.outfits) {
-        recommendations.outfits.forEach(outfit => {
+    if (outfits) {
+        outfits.forEach(outfit => {
             const outfitItem = document.createElement('div');
             outfitItem.className = 'outfit-item';
             
@@ -349,43 +415,34 @@ function displayResults(analysis, recommendations) {
             outfitsGrid.appendChild(outfitItem);
         });
     }
+}
 
-    // Accessories
+function renderAccessories(accessories) {
     const accessoriesList = document.getElementById('accessories-list');
     accessoriesList.innerHTML = '';
     
-    if (recommendations.accessories) {
-        recommendations.accessories.forEach(accessory => {
+    if (accessories) {
+        accessories.forEach(accessory => {
             const item = document.createElement('div');
             item.className = 'accessory-item';
             item.textContent = accessory;
             accessoriesList.appendChild(item);
         });
     }
+}
 
-    // Hairstyles
+function renderHairstyles(hairstyles) {
     const hairstyleList = document.getElementById('hairstyle-list');
     hairstyleList.innerHTML = '';
     
-    if (recommendations.hairstyle) {
-        recommendations.hairstyle.forEach(style => {
+    if (hairstyles) {
+        hairstyles.forEach(style => {
             const item = document.createElement('div');
             item.className = 'hairstyle-item';
             item.textContent = style;
             hairstyleList.appendChild(item);
         });
     }
-
-    // Explanation
-    document.getElementById('explanation-text').textContent = 
-        recommendations.explanation || 'These recommendations are personalized for you!';
-
-    // Shopping (real products by platform)
-    if (recommendations.shopping) {
-        displayShoppingByPlatform(recommendations.shopping);
-    } else {
-        displayShoppingByPlatform();
-    }
 }
 
 function displayShoppingByPlatform(shopping) {
@@ -538,7 +595,7 @@ function capturePhoto() {
     // Convert to blob and upload
     canvas.toBlob(async (blob) => {
         const file = new File([blob], 'camera-photo.jpg', { type: 'image/jpeg' });
-        await handleFileUpload(file);
+        handleFileUpload(file);
         closeCamera();
     }, 'image/jpeg', 0.95);
 }
@@ -0,0 +1,218 @@
+"""Real-time skin analysis over webcam or video frames with face tracking"""
+import cv2
+import numpy as np
+from color_analysis import rgb_to_hex
+from color_classifier import classify
+from skin_analyzer import SkinAnalyzer
+
+# Long side of the grayscale copy used for tracking between detections
+TRACK_MAX_SIDE = 320
+
+# Template-match score below which the tracked face counts as lost
+TRACK_MIN_SCORE = 0.5
+
+# Colour spread (std dev, 0-255 levels) that maps to zero confidence
+CONFIDENCE_STD_SCALE = 24.0
+
+
+class StreamAnalyzer:
+    """
+    Analyzes a stream of BGR frames. The face is detected every
+    `detect_every` processed frames and tracked by template matching in
+    between; skin colour is smoothed with an exponential moving average and
+    the sampling interval grows once the estimate is stable.
+    """
+
+    def __init__(self, analyzer=None, detect_every=10, smoothing=0.2,
+                 confidence_threshold=0.85, min_samples=5, max_sample_interval=8):
+        self.analyzer = analyzer or SkinAnalyzer(estimator='mask')
+        self.detect_every = detect_every
+        self.smoothing = smoothing
+        self.confidence_threshold = confidence_threshold
+        self.min_samples = min_samples
+        self.max_sample_interval = max_sample_interval
+        self.reset()
+
+    def reset(self):
+        """Forget the tracked face and colour statistics"""
+        self.frame_index = -1
+        self.box = None
+        self._template = None
+        self._track_scale = 1.0
+        self._since_detect = 0
+        self._next_sample = 0
+        self._interval = 1
+        self.samples = 0
+        self.mean = None
+        self.var = np.zeros(3)
+        self.stable_result = None
+
+    def process_frame(self, frame):
+        """Feed one BGR frame; returns the current estimate"""
+        self.frame_index += 1
+        if self.frame_index < self._next_sample:
+            return self.result(sampled=False)
+
+        box = self._locate_face(frame)
+        if box is not None:
+            x, y, w, h = box
+            color = self.analyzer._estimate_skin_color(frame[y:y+h, x:x+w])
+            self._update(np.asarray(color, dtype=np.float64))
+        else:
+            # Face lost: look again on the very next frame
+            self._interval = 1
+
+        self._next_sample = self.frame_index + self._interval
+        return self.result(sampled=True)
+
+    def _locate_face(self, frame):
+        """Detect periodically, otherwise track the previous box"""
+        if self.box is not None and self._since_detect < self.detect_every:
+            self._since_detect += 1
+            self.box = self._track(frame)
+            if self.box is not None:
+                return self.box
+
+        faces = self.analyzer._detect_faces(frame)
+        self._since_detect = 0
+        if len(faces) == 0:
+            self.box = None
+            self._template = None
+            return None
+
+        self.box = tuple(int(v) for v in max(faces, key=lambda f: f[2] * f[3]))
+        small = self._tracking_gray(frame)
+        x, y, w, h = self._scale_box(self.box, self._track_scale)
+        self._template = small[y:y+h, x:x+w].copy()
+        return self.box
+
+    def _tracking_gray(self, frame):
+        """Downscaled grayscale frame used for template tracking"""
+        height, width = frame.shape[:2]
+        self._track_scale = min(1.0, TRACK_MAX_SIDE / max(height, width))
+        if self._track_scale < 1.0:
+            frame = cv2.resize(frame, (max(1, round(width * self._track_scale)),
+                                       max(1, round(height * self._track_scale))),
+                               interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    @staticmethod
+    def _scale_box(box, scale):
+        return tuple(int(round(v * scale)) for v in box)
+
+    def _track(self, frame):
+        """Find the face template near its last position; None if lost"""
+        small = self._tracking_gray(frame)
+        x, y, w, h = self._scale_box(self.box, self._track_scale)
+        th, tw = self._template.shape[:2]
+        if tw == 0 or th == 0:
+            return None
+
+        # Search a window of half a face around the previous box
+        left, top = max(0, x - w // 2), max(0, y - h // 2)
+        right = min(small.shape[1], x + w + w // 2)
+        bottom = min(small.shape[0], y + h + h // 2)
+        window = small[top:bottom, left:right]
+        if window.shape[0] < th or window.shape[1] < tw:
+            return None
+
+        scores = cv2.matchTemplate(window, self._template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+        if score < TRACK_MIN_SCORE:
+            return None
+
+        full = (left + dx, top + dy, tw, th)
+        height, width = frame.shape[:2]
+        x, y, w, h = self._scale_box(full, 1 / self._track_scale)
+        x, y = min(max(0, x), width - 1), min(max(0, y), height - 1)
+        return x, y, min(w, width - x), min(h, height - y)
+
+    def _update(self, color):
+        """Exponentially smoothed mean/variance and adaptive sampling"""
+        self.samples += 1
+        if self.mean is None:
+            self.mean = color
+            return
+
+        delta = color - self.mean
+        alpha = self.smoothing
+        self.mean = self.mean + alpha * delta
+        self.var = (1 - alpha) * (self.var + alpha * delta ** 2)
+
+        if self.confidence >= self.confidence_threshold:
+            # Stable: sample less often
+            self._interval = min(self._interval * 2, self.max_sample_interval)
+        elif np.any(np.abs(delta) > 3 * np.sqrt(self.var) + 1):
+            # Sudden change (lighting, new person): sample every frame again
+            self._interval = 1
+            self.stable_result = None
+
+    @property
+    def confidence(self):
+        """1.0 for a perfectly steady colour, falling to 0 as it spreads"""
+        if self.samples < self.min_samples:
+            return 0.0
+        spread = float(np.sqrt(self.var.mean()))
+        return max(0.0, 1.0 - spread / CONFIDENCE_STD_SCALE)
+
+    def result(self, sampled=True):
+        """Current estimate; 'stable' once confidence has converged"""
+        state = {
+            'frame': self.frame_index,
+            'sampled': sampled,
+            'face': list(self.box) if self.box is not None else None,
+            'samples': self.samples,
+            'confidence': round(self.confidence, 3),
+            'stable': False
+        }
+        if self.mean is None:
+            return state
+
+        rgb = [int(round(v)) for v in self.mean]
+        skin_tone, undertone = classify(rgb)
+        state.update({'skin_tone': skin_tone, 'undertone': undertone,
+                      'rgb': rgb, 'hex': rgb_to_hex(rgb)})
+
+        if self.stable_result is None and self.confidence >= self.confidence_threshold:
+            self.stable_result = {'skin_tone': skin_tone, 'undertone': undertone,
+                                  'rgb': rgb, 'hex': rgb_to_hex(rgb)}
+        if self.stable_result is not None:
+            state.update(self.stable_result)
+            state['stable'] = True
+        return state
+
+
+def analyze_video(source, max_frames=None, stop_when_stable=True, **kwargs):
+    """
+    Analyze a video file path or camera index with cv2.VideoCapture.
+    Returns the final estimate (with 'success') after the clip ends, the
+    classification converges, or max_frames frames have been read.
+    """
+    stream = StreamAnalyzer(**kwargs)
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        return {'error': 'Could not open video'}
+
+    state = stream.result(sampled=False)
+    try:
+        while max_frames is None or stream.frame_index + 1 < max_frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            state = stream.process_frame(frame)
+            if stop_when_stable and state['stable']:
+                break
+    finally:
+        capture.release()
+
+    if 'skin_tone' not in state:
+        return {'error': 'No face detected', 'frames': stream.frame_index + 1}
+    return {'success': True, 'frames': stream.frame_index + 1, **state}
+
+
+if __name__ == '__main__':
+    import sys
+
+    # Webcam by default, or a video file path / camera index
+    source = sys.argv[1] if len(sys.argv) > 1 else '0'
+    print(analyze_video(int(source) if source.isdigit() else source))
@@ -0,0 +1,159 @@
+"""
+Style catalog: built-in palettes, outfits, accessories, hairstyles, the
+AI stylist's fallback and the shopping placeholder images.
+
+The data lives in a versioned JSON file (data/style_catalog.json, or
+STYLE_CATALOG_PATH). It is compiled into read-only mappings
+(types.MappingProxyType) and tuples expanded into one entry per (skin
+tone, undertone, occasion), so serving a fallback recommendation is a
+single dict lookup.
+
+When the file's mtime or size changes it is reloaded on the next access
+(checked at most every STYLE_CATALOG_RELOAD_INTERVAL seconds). The new
+catalog is compiled completely before it replaces the old one in a single
+assignment; a file that fails to load leaves the current catalog in place.
+Replace the file atomically (write a temp file, then rename) when editing.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+from color_classifier import SKIN_TONES, UNDERTONES
+
+CATALOG_PATH = os.getenv(
+    'STYLE_CATALOG_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'style_catalog.json')
+)
+RELOAD_INTERVAL = float(os.getenv('STYLE_CATALOG_RELOAD_INTERVAL', 2))
+
+_TONES = frozenset(SKIN_TONES)
+_UNDERTONES = frozenset(UNDERTONES)
+
+
+def freeze(value):
+    """Recursively turn dicts into read-only mappings and lists into tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def read_file(path):
+    """Raw bytes of the catalog file"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def compile_catalog(tables):
+    """
+    Expand the recommendation tables into a frozen {(tone, undertone, occasion): entry}
+    table. None stands for any value not in the tables, so every request maps
+    to exactly one precompiled entry.
+    """
+    tables = freeze(tables)
+    palettes = tables['color_palettes']
+    outfits = tables['outfits']
+    accessories = tables['accessories_by_occasion']
+    hairstyles = tables['hairstyles_by_occasion']
+    default_palette = palettes[tables['default_palette']]
+
+    occasions = tuple(sorted(set(accessories) | set(hairstyles)))
+    catalog = {}
+    for tone in SKIN_TONES + (None,):
+        for undertone in UNDERTONES + (None,):
+            palette_key = f"{tone}_{undertone}"
+            for occasion in occasions + (None,):
+                catalog[(tone, undertone, occasion)] = MappingProxyType({
+                    'color_palette': palettes.get(palette_key, default_palette),
+                    'outfits': outfits.get(palette_key, tables['default_outfits']),
+                    'accessories': accessories.get(occasion, {}).get(undertone, tables['default_accessories']),
+                    'hairstyle': hairstyles.get(occasion, {}).get(tone, tables['default_hairstyles'])
+                })
+
+    return MappingProxyType(catalog), frozenset(occasions)
+
+
+class Catalog:
+    """One loaded, frozen version of the catalog file"""
+
+    def __init__(self, data, digest, stamp=None):
+        self.version = f"{data['version']}-{digest[:12]}"
+        self.stamp = stamp
+        self.entries, self.occasions = compile_catalog(data['recommendations'])
+        self.stylist_fallback = freeze(data['stylist_fallback'])
+        self.images = freeze(data['placeholder_images']['by_category'])
+        self.default_image = data['placeholder_images']['default']
+
+    @classmethod
+    def load(cls, path=CATALOG_PATH):
+        """Read, parse and compile a catalog file"""
+        stat = os.stat(path)
+        raw = read_file(path)
+        return cls(json.loads(raw), hashlib.sha256(raw).hexdigest(), (stat.st_mtime_ns, stat.st_size))
+
+    def lookup(self, skin_tone, undertone, occasion):
+        """
+        Frozen entry with color_palette, outfits, accessories and hairstyle.
+        Callers must not (and cannot) modify it.
+        """
+        return self.entries[(
+            skin_tone if skin_tone in _TONES else None,
+            undertone if undertone in _UNDERTONES else None,
+            occasion if occasion in self.occasions else None
+        )]
+
+    def stylist_colors(self, skin_tone, undertone):
+        """The AI stylist's fallback hex colors for a tone and undertone"""
+        palettes = self.stylist_fallback['palettes']
+        return palettes.get(f"{skin_tone}_{undertone}", palettes[self.stylist_fallback['default_palette']])
+
+    def placeholder_image(self, category):
+        """Product image URL for a shopping category"""
+        return self.images.get(category.lower(), self.default_image)
+
+
+_current = Catalog.load()
+_seen_stamp = _current.stamp  # last file state tried, loaded or not
+_checked_at = time.monotonic()
+_reload_lock = threading.Lock()
+
+
+def current():
+    """
+    The catalog in use, reloading it first if the file changed. Callers
+    that read several things should take one snapshot and use it throughout.
+    """
+    global _current, _seen_stamp, _checked_at
+    if time.monotonic() - _checked_at < RELOAD_INTERVAL:
+        return _current
+
+    # One thread checks; the others keep using the current catalog meanwhile
+    if _reload_lock.acquire(blocking=False):
+        try:
+            _checked_at = time.monotonic()
+            stat = os.stat(CATALOG_PATH)
+            if (stat.st_mtime_ns, stat.st_size) != _seen_stamp:
+                _seen_stamp = (stat.st_mtime_ns, stat.st_size)
+                catalog = Catalog.load(CATALOG_PATH)
+                _current = catalog
+                print(f"Reloaded style catalog {catalog.version}")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Style catalog reload failed, keeping {_current.version}: {e}")
+        finally:
+            _reload_lock.release()
+    return _current
+
+
+def lookup(skin_tone, undertone, occasion):
+    """Entry for a profile from the current catalog"""
+    return current().lookup(skin_tone, undertone, occasion)
+
+
+def json_default(value):
+    """json.dumps `default` hook for the frozen mappings"""
+    if isinstance(value, MappingProxyType):
+        return dict(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')